@@ -0,0 +1,205 @@
+#******************************************************************************
+# Copyright (C) 2013 Michael Mauderer <mail@MichaelMauderer.de>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all  copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE
+#
+#******************************************************************************
+"""
+Renders the jobs of a manifest concurrently.
+
+Jobs are split into the creation of the dot layout and its rendering.
+Seeded jobs with identical layout parameters share one layout, which is
+created only once. Layouts and renders run in a pool of processes, a render starts
+as soon as its layout is available. See textures.py for the manifest format.
+
+Usage: python batch.py manifest.json [--workers N] [--report report.json]
+"""
+import argparse
+import json
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import textures
+
+layout_functions = {'plane': textures.plane_dots,
+                    'polygon': textures.polygon_dots,
+                    'sphere': textures.sphere_dots}
+# Layout type of each texture type
+layout_types = {'plane': 'plane',
+                'polygon': 'polygon',
+                'sphere': 'sphere',
+                'cube': 'sphere'}
+draw_functions = {'plane': textures.draw_plane_dots,
+                  'polygon': textures.draw_plane_dots,
+                  'sphere': textures.draw_sphere_dots,
+                  'cube': textures.draw_cube_dots}
+# Job arguments that only affect the rendering of a layout
+draw_arguments = {'plane': ['image_size', 'filename', 'antialias', 'colors',
+                            'bit_depth'],
+                  'polygon': ['image_size', 'filename', 'antialias', 'colors',
+                              'bit_depth'],
+                  'sphere': ['dot_r', 'image_size', 'filename', 'antialias',
+                             'mipmaps'],
+                  'cube': ['dot_r', 'face_size', 'filename', 'antialias',
+                           'mipmaps']}
+# Job arguments that affect both the layout and its rendering
+shared_arguments = {'plane': ['periodic']}
+
+
+def split_job(job):
+    """
+    Splits a job into the arguments of its layout and of its rendering.
+    Returns a tuple (layout key, layout arguments, draw arguments). Jobs with
+    equal layout keys share their layout, this includes sphere and cube map
+    textures of the same layout. Unseeded jobs create a layout of their own
+    and have the layout key None.
+    Raises a ValueError if the job has no known type.
+    """
+    layout_args = dict(job)
+    kind = layout_args.get('type')
+    if kind not in draw_functions:
+        raise ValueError('Unknown texture type: {0!r}'.format(kind))
+    draw_args = {'type': kind}
+    for name in draw_arguments[kind]:
+        if name in layout_args:
+            draw_args[name] = layout_args.pop(name)
+    for name in shared_arguments.get(kind, []):
+        if name in layout_args:
+            draw_args[name] = layout_args[name]
+    layout_args['type'] = layout_types[kind]
+    # Each render runs in a single worker of the pool.
+    layout_args.pop('workers', None)
+    if layout_args.get('seed') is None:
+        return None, layout_args, draw_args
+    key = json.dumps(layout_args, sort_keys=True)
+    return key, layout_args, draw_args
+
+
+def _create_layout(layout_args):
+    layout_args = dict(layout_args)
+    start = time.perf_counter()
+    dots = layout_functions[layout_args.pop('type')](**layout_args)
+    return dots, time.perf_counter() - start
+
+
+def _draw(dots, draw_args):
+    draw_args = dict(draw_args)
+    start = time.perf_counter()
+    draw_functions[draw_args.pop('type')](dots, **draw_args)
+    return time.perf_counter() - start
+
+
+def _error(exception):
+    return ''.join(traceback.format_exception_only(type(exception),
+                                                   exception)).strip()
+
+
+def run_jobs(jobs, workers=None):
+    """
+    Renders all jobs in a pool of worker processes.
+
+    Parameters
+    ----------
+    jobs : List of job dictionaries, see textures.py.
+    workers : Number of worker processes, None uses all cores.
+
+    Returns
+    -------
+    List containing for each job a dictionary with its filename, the
+    seconds spent creating its (possibly shared) layout and rendering it,
+    whether its layout was shared with an earlier job and the error message
+    if it failed.
+    """
+    reports = [{'filename': job.get('filename'), 'layout_seconds': None,
+                'render_seconds': None, 'shared_layout': False, 'error': None}
+               for job in jobs]
+    splits = {}
+    dependents = {}
+    for index, job in enumerate(jobs):
+        try:
+            key, layout_args, draw_args = split_job(job)
+        except Exception as e:
+            reports[index]['error'] = _error(e)
+            continue
+        splits[index] = layout_args, draw_args
+        if key is None:
+            key = index
+        if key in dependents:
+            reports[index]['shared_layout'] = True
+        dependents.setdefault(key, []).append(index)
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = {}
+        for key, indices in dependents.items():
+            future = executor.submit(_create_layout, splits[indices[0]][0])
+            pending[future] = ('layout', key)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, target = pending.pop(future)
+                if stage == 'render':
+                    try:
+                        reports[target]['render_seconds'] = future.result()
+                    except Exception as e:
+                        reports[target]['error'] = _error(e)
+                    continue
+                try:
+                    dots, seconds = future.result()
+                except Exception as e:
+                    for index in dependents[target]:
+                        reports[index]['error'] = _error(e)
+                    continue
+                for index in dependents[target]:
+                    reports[index]['layout_seconds'] = seconds
+                    render = executor.submit(_draw, dots, splits[index][1])
+                    pending[render] = ('render', index)
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('manifest', help='JSON file containing the jobs')
+    parser.add_argument('--workers', type=int,
+                        help='number of worker processes, default all cores')
+    parser.add_argument('--report', help='write the job report to a JSON file')
+    args = parser.parse_args(argv)
+
+    with open(args.manifest) as f:
+        jobs = json.load(f)
+    start = time.perf_counter()
+    reports = run_jobs(jobs, args.workers)
+    for report in reports:
+        if report['error']:
+            print('{0}: failed: {1}'.format(report['filename'],
+                                            report['error']))
+        else:
+            print('{0}: layout {1:.2f}s{2}, render {3:.2f}s'.format(
+                report['filename'], report['layout_seconds'],
+                ' (shared)' if report['shared_layout'] else '',
+                report['render_seconds']))
+    print('Total: {0:.2f}s'.format(time.perf_counter() - start))
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(reports, f, indent=2)
+    return 1 if any(report['error'] for report in reports) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#******************************************************************************
+# Copyright (C) 2013 Michael Mauderer <mail@MichaelMauderer.de>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all  copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE
+#
+#******************************************************************************
+"""
+Benchmarks for dot placement and rendering.
+
+Measures the throughput of the dot iterators in util (dots and misses per
+second, time until saturation) and of the renderers used by the scripts
+(megapixels per second, peak memory) for a matrix of dot counts, radii mixes
+and image sizes. Results can be written as JSON or CSV and compared against
+a stored baseline.
+
+Usage: python benchmark.py [--quick] [--output results.json]
+                           [--baseline baseline.json] [--tolerance 0.25]
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import util
+import render
+
+#------------------------------------------------------------------------------
+# Benchmark matrix
+#------------------------------------------------------------------------------
+placement_kinds = ['plane', 'polygon', 'sphere']
+placement_methods = ['random', 'batch', 'poisson']
+dot_counts = [1000, 10000]
+radii_mixes = ['uniform', 'mixed']
+render_kinds = ['plane', 'polygon', 'sphere']
+image_sizes = [1024, 4096]
+# Fraction of the domain covered by the requested dots
+coverage = 0.4
+
+octagon_a = math.sqrt(2) - 1
+octagon_c = octagon_a / math.sqrt(2)
+octagon = [(octagon_c, 0), (octagon_a + octagon_c, 0), (1, octagon_c),
+           (1, octagon_a + octagon_c), (octagon_a + octagon_c, 1),
+           (octagon_c, 1), (0, octagon_a + octagon_c), (0, octagon_c)]
+
+
+def plane_radii(n, mix):
+    """
+    Returns n radii covering roughly the coverage fraction of the unit plane.
+    """
+    r = math.sqrt(coverage / (math.pi * n))
+    if mix == 'uniform':
+        return [r] * n
+    return [1.5 * r] * (n // 4) + [0.75 * r] * (n - n // 4)
+
+
+def sphere_distance(n):
+    """
+    Returns the minimal dot distance for n dots covering roughly the coverage
+    fraction of the unit sphere.
+    """
+    return 4 * math.sqrt(coverage / n)
+
+
+def create_iterator(kind, method, n, mix, seed=0, stats=None):
+    kwargs = {'allowed_misses': 1000, 'seed': seed, 'stats': stats}
+    if method == 'batch':
+        kwargs['batch_size'] = 1024
+    if kind == 'sphere':
+        cls = {'random': util.iter_dots_on_sphere,
+               'batch': util.iter_dots_on_sphere,
+               'poisson': util.iter_poisson_dots_on_sphere}[method]
+        return cls(sphere_distance(n), n, **kwargs)
+    if kind == 'plane':
+        cls = {'random': util.iter_dots_on_plane,
+               'batch': util.iter_dots_on_plane,
+               'poisson': util.iter_poisson_dots_on_plane}[method]
+        return cls(plane_radii(n, mix), 0, 1.05, **kwargs)
+    cls = {'random': util.iter_dots_in_polygon,
+           'batch': util.iter_dots_in_polygon,
+           'poisson': util.iter_poisson_dots_in_polygon}[method]
+    return cls(octagon, plane_radii(n, mix), 0, 1.05, **kwargs)
+
+
+def benchmark_placement(kind, method, n, mix):
+    stats = util.placement_stats()
+    iterator = create_iterator(kind, method, n, mix, stats=stats)
+    start = time.perf_counter()
+    dots = sum(1 for _ in iterator)
+    seconds = time.perf_counter() - start
+    return {'benchmark': 'placement', 'kind': kind, 'method': method,
+            'n': n, 'mix': mix, 'dots': dots, 'misses': stats.misses,
+            'seconds': seconds,
+            'saturated': dots < n,
+            'dots_per_second': dots / seconds,
+            'misses_per_second': stats.misses / seconds,
+            'distance_checks': stats.distance_checks,
+            'generation_seconds': stats.generation_time,
+            'validation_seconds': stats.validation_time}
+
+
+def _timed_render(kind, n, size, workers):
+    """
+    Renders one texture and returns the time taken and the peak resident
+    memory of the process. Runs in a fresh process.
+    """
+    mix = 'uniform'
+    if kind == 'sphere':
+        dots = util.layout_array(create_iterator(kind, 'batch', n, mix))
+        start = time.perf_counter()
+        render.rasterize_dots_on_sphere(dots, sphere_distance(n) / 2.5,
+                                        (2 * size, size), workers)
+        pixels = 2 * size * size
+    elif kind == 'plane':
+        dots = util.layout_array(create_iterator(kind, 'batch', n, mix))
+        start = time.perf_counter()
+        render.render_dots_on_plane(dots, (size, size), workers)
+        pixels = size * size
+    else:
+        dots = util.layout_array(create_iterator(kind, 'batch', n, mix))
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            render.write_dots_on_plane(dots, (size, size),
+                                       os.path.join(directory, 'texture.png'),
+                                       workers=workers)
+        pixels = size * size
+    seconds = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return seconds, pixels, peak_rss
+
+
+def benchmark_render(kind, n, size, workers=1):
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(1, mp_context=context) as executor:
+        seconds, pixels, peak_rss = executor.submit(
+            _timed_render, kind, n, size, workers).result()
+    return {'benchmark': 'render', 'kind': kind, 'n': n, 'size': size,
+            'workers': workers, 'seconds': seconds,
+            'megapixels_per_second': pixels / seconds / 1e6,
+            'peak_rss_mb': peak_rss / 2 ** 20}
+
+
+def run_benchmarks(quick=False, log=sys.stderr):
+    counts = dot_counts[:1] if quick else dot_counts
+    sizes = image_sizes[:1] if quick else image_sizes
+    results = []
+    for kind, method, n, mix in itertools.product(
+            placement_kinds, placement_methods, counts, radii_mixes):
+        if kind == 'sphere' and mix != 'uniform':
+            continue
+        results.append(benchmark_placement(kind, method, n, mix))
+        print(result_name(results[-1]), file=log)
+    for kind, n, size in itertools.product(render_kinds, counts, sizes):
+        results.append(benchmark_render(kind, n, size))
+        print(result_name(results[-1]), file=log)
+    return results
+
+
+#------------------------------------------------------------------------------
+# Results
+#------------------------------------------------------------------------------
+key_fields = ['benchmark', 'kind', 'method', 'n', 'mix', 'size', 'workers']
+# Metrics checked against the baseline and whether larger values are better
+compared_metrics = {'dots_per_second': True,
+                    'megapixels_per_second': True,
+                    'peak_rss_mb': False}
+
+
+def result_name(result):
+    return '/'.join(str(result[field]) for field in key_fields
+                    if field in result)
+
+
+def compare_results(results, baseline, tolerance=0.25):
+    """
+    Compares results against baseline results.
+    Returns a list of (name, metric, baseline value, value) tuples of all
+    metrics that got worse by more than the tolerance fraction.
+    """
+    baseline = {result_name(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        reference = baseline.get(result_name(result))
+        if reference is None:
+            continue
+        for metric, higher_is_better in compared_metrics.items():
+            if metric not in result or metric not in reference:
+                continue
+            value, expected = result[metric], reference[metric]
+            if higher_is_better:
+                regressed = value < expected * (1 - tolerance)
+            else:
+                regressed = value > expected * (1 + tolerance)
+            if regressed:
+                regressions.append((result_name(result), metric, expected,
+                                    value))
+    return regressions
+
+
+def write_results(results, filename):
+    if filename.endswith('.csv'):
+        fields = sorted(set(itertools.chain.from_iterable(results)))
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fields)
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(filename, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--quick', action='store_true',
+                        help='only run the smallest dot counts and sizes')
+    parser.add_argument('--output', help='write results to a .json or .csv '
+                                         'file')
+    parser.add_argument('--baseline', help='compare against results of a '
+                                           'previous run stored as .json')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative regression against the '
+                             'baseline')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.quick)
+    if args.output:
+        write_results(results, args.output)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        for name, metric, expected, value in regressions:
+            print('Regression in {0}: {1} {2:.4g} -> {3:.4g}'.format(
+                name, metric, expected, value), file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#******************************************************************************
+# Copyright (C) 2013 Michael Mauderer <mail@MichaelMauderer.de>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all  copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE
+#
+#******************************************************************************
+import hashlib
+import json
+import os
+import numpy as np
+import util
+
+
+class layout_cache():
+    """
+    On disk cache of dot layouts.
+    Layouts are stored as .npy arrays with one dot per row and are addressed
+    by a hash of the parameters of the iterator that created them. If the
+    total size of the cache exceeds max_bytes the least recently used
+    layouts are removed.
+
+    Parameters
+    ----------
+    directory : Directory containing the cached layouts.
+    max_bytes : Upper limit for the total size of all cached layouts.
+    """
+
+    def __init__(self, directory, max_bytes=1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(parameters):
+        """
+        Returns the hash identifying a layout with the given parameters.
+        """
+        encoded = json.dumps(parameters, sort_keys=True, default=float)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def load(self, key):
+        """
+        Returns the layout stored under the key as array or None if it is
+        not cached.
+        """
+        path = self.path(key)
+        try:
+            dots = np.load(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        # The modification time orders layouts by their last use.
+        os.utime(path)
+        return dots
+
+    def store(self, key, dots):
+        """
+        Stores a layout given as array with one dot per row.
+        """
+        path = self.path(key)
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            np.save(f, np.asarray(dots, dtype=np.float64))
+        os.replace(temporary, path)
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used layouts until the cache fits into
+        max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def dots(self, iterator):
+        """
+        Returns the array of dots created by the iterator. Layouts of seeded
+        iterators are loaded from the cache if present and stored otherwise.
+        Unseeded iterators are never cached.
+        """
+        parameters = iterator.layout_parameters()
+        if parameters['seed'] is None:
+            return util.layout_array(iterator)
+        key = self.key(parameters)
+        dots = self.load(key)
+        if dots is None:
+            dots = util.layout_array(iterator)
+            self.store(key, dots)
+        return dots
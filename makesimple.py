@@ -20,8 +20,7 @@
 # IN THE SOFTWARE
 #
 #******************************************************************************
-from PIL import Image, ImageDraw
-import util
+import textures
 
 #-----------------------------------------------------------------------------
 # Script parameters
@@ -32,18 +31,27 @@ max_dot_n = 100
 border_distance = max(dot_radii) * 1.5
 image_size = 1024, 1024
 image_filename = 'texture.png'
+# Seed of the dot layout, None for a random layout
+seed = None
+# Directory caching seeded layouts, None disables the cache
+cache_directory = None
+# Number of rendering processes, None uses all cores
+workers = None
+# Render gray edge pixels of their coverage instead of hard edges
+antialias = False
+# Colors (dot, background) as RGB tuples, None for black on white grayscale
+colors = None
+# Bits per pixel of the texture, 1 for hard edged black and white textures
+bit_depth = 8
+# Create a seamlessly tileable texture without border
+periodic = False
 
 #------------------------------------------------------------------------------
-# Save the array to an image
+# Render the texture
 #------------------------------------------------------------------------------
-image = Image.new('RGB', image_size, (255, 255, 255))
-draw = ImageDraw.Draw(image)
-dot_iter = util.iter_dots_on_plane(dot_radii, border_distance, 1.05)
-for dot in dot_iter:
-    x, y, r = dot
-    x_left = (x - r) * image_size[0]
-    x_right = (x + r) * image_size[0]
-    y_upper = (y - r) * image_size[1]
-    y_lower = (y + r) * image_size[1]
-    draw.ellipse((x_left, y_upper, x_right, y_lower), fill=(0, 0, 0))
-image.save(image_filename)
+if __name__ == '__main__':
+    textures.render_plane(dot_radii, image_size, image_filename,
+                          0 if periodic else border_distance, 1.05,
+                          workers=workers, antialias=antialias, colors=colors,
+                          bit_depth=bit_depth, periodic=periodic, seed=seed,
+                          cache_directory=cache_directory)
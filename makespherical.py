@@ -20,9 +20,7 @@
 # IN THE SOFTWARE
 #
 #******************************************************************************
-import numpy as np
-from PIL import Image
-import util
+import textures
 
 #-----------------------------------------------------------------------------
 # Script parameters
@@ -32,40 +30,21 @@ max_dot_n = 150
 dot_min_distance = 2.5 * dot_r
 image_size = 2048, 1024
 image_filename = 'texture.png'
+# Seed of the dot layout, None for a random layout
+seed = None
+# Directory caching seeded layouts, None disables the cache
+cache_directory = None
+# Number of rendering processes, None uses all cores
+workers = None
+# Render gray edge pixels of their coverage instead of hard edges
+antialias = False
 
 #------------------------------------------------------------------------------
-# Create array of cylinder coordinates for each pixel of the texture
+# Render the randomly generated points on the sphere into the cylindric
+# projection. Pixels within dot_r of any point are black, all others white.
 #------------------------------------------------------------------------------
-angles = np.linspace(0, 2 * np.pi, image_size[0])
-height = np.linspace(0, 1., image_size[1])
-angle_grid, height_grid = np.meshgrid(angles, height)
-
-#------------------------------------------------------------------------------
-# Convert cylinder coordinates to spherical coordinates
-#------------------------------------------------------------------------------
-spherical_points = util.cylindric_to_spheric(height_grid, angle_grid)
-
-#------------------------------------------------------------------------------
-# Compute distances to each randomly generated point on the sphere
-# Keep the minimal distance for each pixel
-#------------------------------------------------------------------------------
-dots = util.iter_dots_on_sphere(max_dot_n, dot_min_distance)
-min_distances = util.great_circle_distance(spherical_points, next(dots))
-for dot in dots:
-    distances = util.great_circle_distance(spherical_points, dot)
-    np.minimum(distances, min_distances, out=min_distances)
-
-#------------------------------------------------------------------------------
-# Use the float array to create an array of uint8, containing either black if
-# the minimal distance for a given pixel to any of the points is below
-# the dot_r or white otherwise
-#------------------------------------------------------------------------------
-black = np.zeros(image_size, dtype=np.uint8)
-white = np.ones(image_size, dtype=np.uint8) * 255
-spherical_projected_texture = np.where(min_distances.T < dot_r, black, white)
-
-#------------------------------------------------------------------------------
-# Save the array to an image
-#------------------------------------------------------------------------------
-image = Image.fromarray(spherical_projected_texture.T)
-image.save(image_filename)
+if __name__ == '__main__':
+    textures.render_sphere(dot_min_distance, max_dot_n, dot_r, image_size,
+                           image_filename, workers=workers,
+                           antialias=antialias, seed=seed,
+                           cache_directory=cache_directory)
@@ -0,0 +1,872 @@
+#******************************************************************************
+# Copyright (C) 2013 Michael Mauderer <mail@MichaelMauderer.de>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all  copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE
+#
+#******************************************************************************
+import itertools
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import util
+
+
+def sphere_pixel_coordinates(image_size):
+    """
+    Returns the spherical coordinates of the pixel rows and columns of a
+    texture containing the cylindric projection of the unit sphere.
+
+    Parameters
+    ----------
+    image_size : Tuple (width, height) of the texture.
+
+    Returns
+    -------
+    Tuple of the following arrays:
+
+    latitudes : Latitude of each row.
+    longitudes : Longitude of each column.
+    """
+    width, height = image_size
+    angles = np.linspace(0, 2 * np.pi, width)
+    heights = np.linspace(0, 1., height)
+    latitudes, _ = util.cylindric_to_spheric(heights, 0)
+    _, longitudes = util.cylindric_to_spheric(0.5, angles)
+    return latitudes, longitudes
+
+
+def sphere_dot_regions(dots, dot_r, image_size):
+    """
+    Returns the rows and columns of the cylindric sphere texture that can
+    contain pixels closer than dot_r to each of the dots.
+    The region of a dot spans its latitude band and its longitude span at
+    its widest point. Dots that cover a pole span all columns.
+
+    Parameters
+    ----------
+    dots : Array of (latitude, longitude) rows.
+    dot_r : Radius of the dots as great circle distance.
+    image_size : Tuple (width, height) of the texture.
+
+    Returns
+    -------
+    Tuple of integer arrays (first_rows, last_rows, first_columns,
+    last_columns) of inclusive bounds. Column bounds may lie beyond the
+    texture and wrap around its seam.
+    """
+    latitudes = dots[:, 0]
+    longitudes = dots[:, 1]
+    width, height = image_size
+    lowest = np.maximum(latitudes - dot_r, -np.pi / 2)
+    highest = np.minimum(latitudes + dot_r, np.pi / 2)
+    # Rows are spaced evenly in height, which is the sine of the latitude.
+    first_rows = np.floor((np.sin(lowest) + 1) / 2 * (height - 1)) - 1
+    last_rows = np.ceil((np.sin(highest) + 1) / 2 * (height - 1)) + 1
+    first_rows = np.maximum(first_rows, 0).astype(np.intp)
+    last_rows = np.minimum(last_rows, height - 1).astype(np.intp)
+
+    # First and last column show the same longitude.
+    period = width - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spans = np.arcsin(np.minimum(np.sin(dot_r) / np.cos(latitudes), 1.))
+    centers = (longitudes + np.pi) / (2 * np.pi) * period
+    first_columns = np.floor(centers - spans / (2 * np.pi) * period) - 1
+    last_columns = np.ceil(centers + spans / (2 * np.pi) * period) + 1
+    partial = ((lowest > -np.pi / 2) & (highest < np.pi / 2) &
+               (dot_r < np.pi / 2) & (last_columns - first_columns < period))
+    first_columns = np.where(partial, first_columns, 0).astype(np.intp)
+    last_columns = np.where(partial, last_columns, width - 1).astype(np.intp)
+    return first_rows, last_rows, first_columns, last_columns
+
+
+def _column_spans(first, last, width):
+    """
+    Returns the list of (start, stop) tuples of the columns first to last
+    wrapped around the seam of a cylindric sphere texture.
+    """
+    period = width - 1
+    spans = []
+    for shift in (-period, 0, period):
+        start = max(first + shift, 0)
+        stop = min(last + shift, width - 1) + 1
+        if start < stop:
+            spans.append((start, stop))
+    spans.sort()
+    merged = spans[:1]
+    for start, stop in spans[1:]:
+        if start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def dot_pixel_region(dot, dot_r, image_size):
+    """
+    Returns the rows and columns of the cylindric sphere texture that can
+    contain pixels closer than dot_r to the dot.
+    See `sphere_dot_regions`.
+
+    Parameters
+    ----------
+    dot : Tuple (latitude, longitude) of the dot center.
+    dot_r : Radius of the dot as great circle distance.
+    image_size : Tuple (width, height) of the texture.
+
+    Returns
+    -------
+    Tuple of index arrays (rows, columns).
+    """
+    first_row, last_row, first, last = (
+        int(bound[0]) for bound in
+        sphere_dot_regions(np.array([dot], dtype=np.float64), dot_r,
+                           image_size))
+    rows = np.arange(first_row, last_row + 1)
+    columns = [np.arange(start, stop)
+               for start, stop in _column_spans(first, last, image_size[0])]
+    return rows, np.concatenate(columns or [np.arange(0)])
+
+
+def coverage_values(signed_distance):
+    """
+    Converts the signed distance in pixels of pixel centers to the edge of a
+    dot into gray values. Pixels whose center lies on the edge are half
+    covered, the coverage falls off linearly over the width of one pixel.
+    Covered pixels are black.
+    """
+    coverage = np.clip(0.5 - signed_distance, 0, 1)
+    return np.rint(255 * (1 - coverage)).astype(np.uint8)
+
+
+def _antialiased_sphere_values(cos_distance, dot, dot_r, sin_latitudes,
+                               cos_latitudes, row_steps, cos_d_longitudes,
+                               sin_d_longitudes, column_step):
+    """
+    Returns the gray values of the pixels of a region around a dot on the
+    sphere.
+    The great circle distance to the dot edge is converted to pixels with
+    the length of the distance gradient in pixel space. One pixel spans
+    row_steps radians of latitude and column_step radians of longitude.
+    """
+    sin_latitude, cos_latitude = dot
+    cos_distance = np.clip(cos_distance, -1, 1)
+    distance = np.arccos(cos_distance)
+    sin_distance = np.sqrt(1 - cos_distance ** 2)
+    # Components of the dot center in the local north and east directions.
+    north = (cos_latitudes[:, np.newaxis] * sin_latitude -
+             sin_latitudes[:, np.newaxis] * cos_latitude *
+             cos_d_longitudes[np.newaxis, :])
+    east = -cos_latitude * sin_d_longitudes[np.newaxis, :]
+    gradient = np.hypot(north * row_steps[:, np.newaxis],
+                        east * (column_step * cos_latitudes)[:, np.newaxis])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        signed_distance = (distance - dot_r) * sin_distance / gradient
+    signed_distance = np.where(distance < dot_r / 2, -1, signed_distance)
+    return coverage_values(np.nan_to_num(signed_distance, nan=1))
+
+
+def render_dots_on_sphere_band(dots, dot_r, image_size, top, band_height,
+                               chunk_rows=64, antialias=False):
+    """
+    Renders the rows top to top + band_height of the cylindric projection
+    texture of dots on the unit sphere.
+    Only the pixels in the region around each dot are visited, so the work
+    scales with the area covered by dots instead of the image size.
+
+    Pixels are covered if the dot product of their unit vector and the unit
+    vector of the dot exceeds cos(dot_r). The unit vectors of the pixels are
+    separable into the sine and cosine of the row latitudes and the column
+    longitudes, which are computed once per band, so there is no
+    trigonometry per dot or per pixel. The dot products are computed in
+    chunks of rows using a preallocated float64 buffer, float32 cannot
+    resolve the cosine of small distances.
+
+    If antialias is set, edge pixels get gray values of their fractional
+    coverage computed from the distance to the dot edge.
+
+    Returns
+    -------
+    Array of uint8 with shape (rows, width). Pixels covered by a dot are
+    0, all others are 255.
+    """
+    width, height = image_size
+    band_height = min(band_height, height - top)
+    latitudes, longitudes = sphere_pixel_coordinates(image_size)
+    row_steps = None
+    if antialias:
+        # Latitude spanned by each row, finite at the poles. A single row
+        # spans all latitudes.
+        if height > 1:
+            row_steps = np.abs(np.gradient(latitudes))[top:top + band_height]
+        else:
+            row_steps = np.full(band_height, np.pi)
+    column_step = 2 * np.pi / max(width - 1, 1)
+    latitudes = latitudes[top:top + band_height]
+    sin_latitudes = np.sin(latitudes)
+    cos_latitudes = np.cos(latitudes)
+    sin_longitudes = np.sin(longitudes)
+    cos_longitudes = np.cos(longitudes)
+    cos_r = np.cos(dot_r)
+    band = np.full((band_height, width), 255, dtype=np.uint8)
+    scratch = np.empty((min(chunk_rows, band_height), width))
+    inside = np.empty(scratch.shape, dtype=bool)
+    dots = util.as_dot_array(dots, 2)
+    first_rows, last_rows, first_columns, last_columns = sphere_dot_regions(
+        dots, dot_r, image_size)
+    visible = (first_rows < top + band_height) & (last_rows >= top)
+    centers = np.stack([np.sin(dots[visible, 0]), np.cos(dots[visible, 0]),
+                        np.sin(dots[visible, 1]), np.cos(dots[visible, 1])],
+                       axis=-1)
+    regions = [(tuple(center), max(first - top, 0),
+                min(last - top + 1, band_height),
+                _column_spans(first_column, last_column, width))
+               for center, first, last, first_column, last_column in zip(
+                   centers.tolist(), first_rows[visible].tolist(),
+                   last_rows[visible].tolist(),
+                   first_columns[visible].tolist(),
+                   last_columns[visible].tolist())]
+    for chunk_top in range(0, band_height, chunk_rows):
+        chunk_bottom = min(chunk_top + chunk_rows, band_height)
+        for center, first, stop, spans in regions:
+            first = max(first, chunk_top)
+            stop = min(stop, chunk_bottom)
+            if first >= stop:
+                continue
+            sin_latitude, cos_latitude, sin_longitude, cos_longitude = center
+            row_term = (sin_latitudes[first:stop] * sin_latitude)[:, np.newaxis]
+            row_factor = cos_latitudes[first:stop, np.newaxis]
+            for start, end in spans:
+                cos_d_longitudes = (cos_longitudes[start:end] * cos_longitude +
+                                    sin_longitudes[start:end] * sin_longitude)
+                shape = (stop - first, end - start)
+                cos_distance = scratch[:shape[0], :shape[1]]
+                covered = inside[:shape[0], :shape[1]]
+                np.multiply(row_factor, cos_d_longitudes * cos_latitude,
+                            out=cos_distance)
+                np.add(cos_distance, row_term, out=cos_distance)
+                target = band[first:stop, start:end]
+                if antialias:
+                    sin_d_longitudes = (
+                        sin_longitudes[start:end] * cos_longitude -
+                        cos_longitudes[start:end] * sin_longitude)
+                    values = _antialiased_sphere_values(
+                        cos_distance, (sin_latitude, cos_latitude), dot_r,
+                        sin_latitudes[first:stop], cos_latitudes[first:stop],
+                        row_steps[first:stop], cos_d_longitudes,
+                        sin_d_longitudes, column_step)
+                    np.minimum(target, values, out=target)
+                    continue
+                np.greater(cos_distance, cos_r, out=covered)
+                np.putmask(target, covered, 0)
+    return band
+
+
+def bin_dots_on_sphere_by_band(dots, dot_r, image_size, band_height):
+    """
+    Returns a list containing for each band of rows of the cylindric
+    projection texture the array of dots whose region overlaps it.
+    """
+    dots = util.as_dot_array(dots, 2)
+    first_rows, last_rows, _, _ = sphere_dot_regions(dots, dot_r, image_size)
+    return [dots[(first_rows < top + band_height) & (last_rows >= top)]
+            for top in range(0, image_size[1], band_height)]
+
+
+def rasterize_dots_on_sphere(dots, dot_r, image_size, workers=1,
+                             band_height=64, antialias=False):
+    """
+    Renders dots on the unit sphere into the cylindric projection texture.
+
+    Parameters
+    ----------
+    dots : Array or iterable of (latitude, longitude) dots.
+    dot_r : Radius of the dots as great circle distance.
+    image_size : Tuple (width, height) of the texture.
+    workers : Number of processes rendering bands of rows in parallel.
+              None uses all cores.
+    band_height : Number of rows rendered by one task.
+    antialias : If True edge pixels get gray values of their coverage.
+
+    Returns
+    -------
+    Array of uint8 with shape (height, width). Pixels covered by a dot are
+    0, all others are 255.
+    """
+    if workers == 1:
+        return render_dots_on_sphere_band(dots, dot_r, image_size, 0,
+                                          image_size[1], antialias=antialias)
+    bands = bin_dots_on_sphere_by_band(dots, dot_r, image_size, band_height)
+    band_args = [(band_dots, dot_r, image_size, i * band_height, band_height,
+                  64, antialias)
+                 for i, band_dots in enumerate(bands)]
+    return render_bands(render_dots_on_sphere_band, band_args, band_height,
+                        (image_size[1], image_size[0]), workers)
+
+
+# Names and axes (normal, column direction, row direction) of the faces of a
+# cube map, following the OpenGL convention. Directions are in the frame of
+# `util.spheric_to_cartesian`, whose z axis points to the north pole. The poles
+# therefore lie on the pz and nz faces, not on py and ny as in a y-up frame.
+cube_face_names = ['px', 'nx', 'py', 'ny', 'pz', 'nz']
+cube_face_axes = np.array([[(1, 0, 0), (0, 0, -1), (0, -1, 0)],
+                           [(-1, 0, 0), (0, 0, 1), (0, -1, 0)],
+                           [(0, 1, 0), (1, 0, 0), (0, 0, 1)],
+                           [(0, -1, 0), (1, 0, 0), (0, 0, -1)],
+                           [(0, 0, 1), (1, 0, 0), (0, -1, 0)],
+                           [(0, 0, -1), (-1, 0, 0), (0, -1, 0)]],
+                          dtype=np.float64)
+
+
+def cube_face_region(center, dot_r, axes, face_size):
+    """
+    Returns the rows and columns (first, stop) of a cube map face that can
+    contain texels closer than dot_r to the dot center, or None if the dot
+    does not touch the face.
+    The region is the bounding box of the projection of points on the dot
+    outline onto the face.
+    """
+    normal, column_axis, row_axis = axes
+    facing = center.dot(normal)
+    spread = np.sqrt(max(1 - facing ** 2, 0))
+    # Directions on a face are at most arccos(1 / sqrt(3)) from its normal.
+    # The direction of the dot closest to the normal is cos(distance - dot_r)
+    # from it, unless the dot contains the normal.
+    if (facing < np.cos(dot_r) and
+            np.cos(dot_r) * facing + np.sin(dot_r) * spread <
+            1 / np.sqrt(3) - 1e-9):
+        return None
+    if (dot_r >= np.pi / 2 or
+            np.cos(dot_r) * facing - np.sin(dot_r) * spread <= 1e-3):
+        # The outline reaches the horizon of the face, or the dot is the
+        # area outside of its outline.
+        return (0, face_size), (0, face_size)
+    first_axis = np.cross(center, column_axis if abs(center.dot(column_axis)) < 0.9
+                          else row_axis)
+    first_axis /= np.linalg.norm(first_axis)
+    second_axis = np.cross(center, first_axis)
+    angles = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+    outline = (np.cos(dot_r) * center +
+               np.sin(dot_r) * (np.cos(angles)[:, np.newaxis] * first_axis +
+                                np.sin(angles)[:, np.newaxis] * second_axis))
+    depth = outline.dot(normal)
+    us = outline.dot(column_axis) / depth
+    vs = outline.dot(row_axis) / depth
+    # Pad for the outline between the sampled points.
+    pad = 2 + 0.002 * face_size * max(np.ptp(us), np.ptp(vs))
+
+    def texel_range(low, high):
+        first = int(np.floor((low + 1) / 2 * face_size - 0.5 - pad))
+        stop = int(np.ceil((high + 1) / 2 * face_size - 0.5 + pad)) + 1
+        return max(first, 0), min(stop, face_size)
+
+    rows = texel_range(vs.min(), vs.max())
+    columns = texel_range(us.min(), us.max())
+    if rows[0] >= rows[1] or columns[0] >= columns[1]:
+        return None
+    return rows, columns
+
+
+def rasterize_dots_on_cube(dots, dot_r, face_size, antialias=False):
+    """
+    Renders dots on the unit sphere into the six faces of a cube map.
+    Texels are covered by a dot if the dot product of their direction and
+    the dot center exceeds cos(dot_r). Only the texels in the bounding box of
+    each dot on each face are visited.
+
+    Parameters
+    ----------
+    dots : Array or iterable of (latitude, longitude) dots.
+    dot_r : Radius of the dots as great circle distance.
+    face_size : Edge length of the faces in texels.
+    antialias : If True edge texels get gray values of their coverage.
+
+    Returns
+    -------
+    Array of uint8 with shape (6, face_size, face_size) containing the faces
+    in the order of `cube_face_names`. Covered texels are 0, all others 255.
+    """
+    faces = np.full((6, face_size, face_size), 255, dtype=np.uint8)
+    coordinates = (np.arange(face_size) + 0.5) / face_size * 2 - 1
+    cos_r = np.cos(dot_r)
+    texel_step = 2. / face_size
+    dots = util.as_dot_array(dots, 2)
+    centers = np.stack(util.spheric_to_cartesian(dots[:, 0], dots[:, 1]),
+                       axis=-1)
+    # Directions on a face are at most arccos(1 / sqrt(3)) from its normal.
+    facings = centers.dot(cube_face_axes[:, 0].T)
+    spreads = np.sqrt(np.maximum(1 - facings ** 2, 0))
+    touching = ((facings >= cos_r) |
+                (cos_r * facings + np.sin(dot_r) * spreads >=
+                 1 / np.sqrt(3) - 1e-9))
+    for index, face in zip(*np.nonzero(touching)):
+        center = centers[index]
+        axes = cube_face_axes[face]
+        region = cube_face_region(center, dot_r, axes, face_size)
+        if region is None:
+            continue
+        (first_row, stop_row), (first_column, stop_column) = region
+        us = coordinates[np.newaxis, first_column:stop_column]
+        vs = coordinates[first_row:stop_row, np.newaxis]
+        facing, along_u, along_v = axes.dot(center)
+        length = np.sqrt(1 + us ** 2 + vs ** 2)
+        cos_distance = (facing + us * along_u + vs * along_v) / length
+        target = faces[face, first_row:stop_row, first_column:stop_column]
+        if not antialias:
+            np.putmask(target, cos_distance > cos_r, 0)
+            continue
+        cos_distance = np.clip(cos_distance, -1, 1)
+        distance = np.arccos(cos_distance)
+        sin_distance = np.sqrt(1 - cos_distance ** 2)
+        # Length of the gradient of the distance per texel
+        gradient = np.hypot(along_u - cos_distance * us / length,
+                            along_v - cos_distance * vs / length)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            signed_distance = ((distance - dot_r) * length * sin_distance /
+                               (texel_step * gradient))
+        signed_distance = np.where(distance < dot_r / 2, -1,
+                                   signed_distance)
+        values = coverage_values(np.nan_to_num(signed_distance, nan=1))
+        np.minimum(target, values, out=target)
+    return faces
+
+
+def mip_chain(image):
+    """
+    Returns the list of mip levels of an uint8 image, starting with the
+    image itself and halving its size down to a single pixel. Each level
+    averages blocks of 2x2 pixels of the previous one, odd edges are
+    extended by repeating the last row or column.
+    """
+    levels = [image]
+    while image.shape[0] > 1 or image.shape[1] > 1:
+        height, width = image.shape
+        row_block = 2 if height > 1 else 1
+        column_block = 2 if width > 1 else 1
+        rows = -(-height // row_block)
+        columns = -(-width // column_block)
+        padded = np.pad(image, ((0, rows * row_block - height),
+                                (0, columns * column_block - width)),
+                        mode='edge')
+        blocks = padded.reshape(rows, row_block, columns, column_block)
+        image = np.rint(blocks.mean(axis=(1, 3))).astype(np.uint8)
+        levels.append(image)
+    return levels
+
+
+def _render_band_into(task):
+    """
+    Process pool task rendering one band directly into shared memory.
+    """
+    render_band, args, memory_name, shape, top = task
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        image = np.ndarray(shape, dtype=np.uint8, buffer=memory.buf)
+        band = render_band(*args)
+        image[top:top + len(band)] = band
+        del image
+    finally:
+        memory.close()
+
+
+def render_bands_into(executor, render_band, band_args, band_height, memory,
+                      shape):
+    """
+    Renders bands of rows of an uint8 image with the given executor. Band i
+    covers the rows starting at i * band_height and is rendered by calling
+    render_band(*band_args[i]) in a worker, which writes the rows directly
+    into the shared memory block. No pixel data is sent between processes.
+    """
+    tasks = [(render_band, args, memory.name, shape, i * band_height)
+             for i, args in enumerate(band_args)]
+    for _ in executor.map(_render_band_into, tasks):
+        pass
+
+
+def render_bands(render_band, band_args, band_height, shape, workers=None):
+    """
+    Renders bands of rows of an uint8 image in a pool of processes and
+    returns the image. See `render_bands_into`.
+    """
+    memory = shared_memory.SharedMemory(create=True,
+                                        size=max(int(np.prod(shape)), 1))
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            render_bands_into(executor, render_band, band_args, band_height,
+                              memory, shape)
+        return np.ndarray(shape, dtype=np.uint8, buffer=memory.buf).copy()
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def dot_bounding_boxes(dots, image_size):
+    """
+    Returns the bounding boxes (left, upper, right, lower) in pixels of an
+    array of (x, y, r) dots on the unit plane as rows.
+    """
+    x, y, r = dots[:, 0], dots[:, 1], dots[:, 2]
+    return np.stack([(x - r) * image_size[0], (y - r) * image_size[1],
+                     (x + r) * image_size[0], (y + r) * image_size[1]],
+                    axis=-1)
+
+
+def texture_palette(colors, bit_depth=8):
+    """
+    Returns the palette of a texture as uint8 array of RGB rows, one per
+    gray value of the given bit depth.
+
+    Parameters
+    ----------
+    colors : Tuple (fill, background) of RGB tuples. Covered pixels get the
+             fill color, uncovered pixels the background and gray values of
+             partially covered pixels a mix of both.
+    bit_depth : 8 or 1 bits per pixel.
+    """
+    fill, background = (np.asarray(color, dtype=np.float64)
+                        for color in colors)
+    weights = np.linspace(0, 1, 2 ** bit_depth)[:, np.newaxis]
+    return np.rint(fill * (1 - weights) + background * weights).astype(
+        np.uint8)
+
+
+class png_strip_writer():
+    """
+    Writes an 8 bit grayscale PNG file strip by strip, so the complete image
+    never has to be held in memory.
+    If colors are given the gray values are mapped to colors by the palette
+    of the PNG file, see `texture_palette`. With a bit depth of 1 each pixel
+    is stored as single bit, gray values below 128 are written as covered.
+
+    Parameters
+    ----------
+    filename : Path of the PNG file.
+    image_size : Tuple (width, height) of the image.
+    compression : zlib compression level.
+    colors : Tuple (fill, background) of RGB tuples or None for a grayscale
+             image.
+    bit_depth : 8 or 1 bits per pixel.
+    """
+
+    signature = b'\x89PNG\r\n\x1a\n'
+
+    def __init__(self, filename, image_size, compression=6, colors=None,
+                 bit_depth=8):
+        if bit_depth not in (1, 8):
+            raise ValueError('Unsupported bit depth {0}'.format(bit_depth))
+        self.image_size = image_size
+        self.bit_depth = bit_depth
+        self.rows_written = 0
+        self.file = open(filename, 'wb')
+        self.compressor = zlib.compressobj(compression)
+        self.file.write(self.signature)
+        width, height = image_size
+        # Grayscale or palette, no interlacing
+        color_type = 0 if colors is None else 3
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height,
+                                               bit_depth, color_type, 0, 0, 0))
+        if colors is not None:
+            self._write_chunk(b'PLTE',
+                              texture_palette(colors, bit_depth).tobytes())
+
+    def _write_chunk(self, chunk_type, data):
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(chunk_type)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(chunk_type + data)))
+
+    def write_rows(self, rows):
+        """
+        Appends rows given as uint8 array of shape (n, width) to the image.
+        """
+        rows = np.asarray(rows, dtype=np.uint8)
+        if self.bit_depth == 1:
+            rows = np.packbits(rows >= 128, axis=1)
+        # Prefix each row with filter type 0
+        filtered = np.zeros((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 1:] = rows
+        data = self.compressor.compress(filtered.tobytes())
+        if data:
+            self._write_chunk(b'IDAT', data)
+        self.rows_written += rows.shape[0]
+
+    def close(self):
+        if self.rows_written != self.image_size[1]:
+            raise ValueError('Expected {0} rows but {1} have been '
+                             'written'.format(self.image_size[1],
+                                              self.rows_written))
+        self._write_chunk(b'IDAT', self.compressor.flush())
+        self._write_chunk(b'IEND', b'')
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+
+def wrap_dots_on_plane(dots):
+    """
+    Returns the dots of a periodic layout on the unit plane together with
+    copies, shifted by the size of the plane, of all dots that cross its
+    edges. Rendering them draws each dot crossing an edge on both sides, so
+    the texture tiles seamlessly.
+    """
+    dots = util.as_dot_array(dots, 3)
+    copies = [dots]
+    for shift in itertools.product((-1, 0, 1), repeat=2):
+        if shift == (0, 0):
+            continue
+        shifted = dots + (shift[0], shift[1], 0)
+        x, y, r = shifted[:, 0], shifted[:, 1], shifted[:, 2]
+        copies.append(shifted[(x + r > 0) & (x - r < 1) &
+                              (y + r > 0) & (y - r < 1)])
+    return np.concatenate(copies)
+
+
+def bin_dots_by_strip(dots, image_size, strip_height):
+    """
+    Returns a list containing for each horizontal strip of the texture the
+    array of dots whose bounding box overlaps it.
+    """
+    dots = util.as_dot_array(dots, 3)
+    strip_count = -(-image_size[1] // strip_height)
+    boxes = dot_bounding_boxes(dots, image_size)
+    # One row margin for the rounding of the ellipse outline
+    first = np.maximum((boxes[:, 1].astype(np.intp) - 1) // strip_height, 0)
+    last = np.minimum((boxes[:, 3].astype(np.intp) + 1) // strip_height,
+                      strip_count - 1)
+    return [dots[(first <= strip) & (last >= strip)]
+            for strip in range(strip_count)]
+
+
+def _plane_dot_spans(dots, image_size, top, strip_height):
+    """
+    Returns the runs of pixels of the rows top to top + strip_height whose
+    centers lie inside a dot on the unit plane as arrays (rows, starts,
+    stops), with rows relative to top and stops exclusive.
+    """
+    width, height = image_size
+    x, y, r = dots[:, 0], dots[:, 1], dots[:, 2]
+    first = np.floor((y - r) * height - 0.5).astype(np.intp) + 1
+    stop = np.ceil((y + r) * height - 0.5).astype(np.intp)
+    first = np.maximum(first, top)
+    counts = np.maximum(np.minimum(stop, top + strip_height) - first, 0)
+    owners = np.repeat(np.arange(len(dots)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                  counts)
+    rows = first[owners] + offsets
+    dy = (rows + 0.5) / height - y[owners]
+    half_chords = np.sqrt(np.maximum(r[owners] ** 2 - dy ** 2, 0))
+    starts = np.floor((x[owners] - half_chords) * width - 0.5).astype(np.intp) + 1
+    stops = np.ceil((x[owners] + half_chords) * width - 0.5).astype(np.intp)
+    starts = np.maximum(starts, 0)
+    stops = np.minimum(stops, width)
+    runs = starts < stops
+    return rows[runs] - top, starts[runs], stops[runs]
+
+
+def _plane_dot_groups(dots, image_size, top, strip_height, cells=1 << 18):
+    """
+    Yields the pixels of the bounding boxes of dots on the unit plane within
+    the rows top to top + strip_height, for groups of dots whose boxes have
+    the same width in pixels. Each group is a tuple (radii, dx, dy, valid,
+    index) of arrays that broadcast to shape (rows, columns), with one row
+    per row of a dot in the strip: the radii, the offsets of the pixel
+    centers to the dot center in unit coordinates, whether the pixel lies in
+    the texture and its index in the flattened strip. At most about cells
+    pixels are yielded at once.
+    """
+    width, height = image_size
+    half_widths = np.ceil(dots[:, 2] * width).astype(np.intp) + 1
+    half_heights = np.ceil(dots[:, 2] * height).astype(np.intp) + 1
+    centers = np.floor(dots[:, 1] * height).astype(np.intp)
+    firsts = np.maximum(centers - half_heights, top)
+    counts = np.maximum(np.minimum(centers + half_heights + 1,
+                                   top + strip_height) - firsts, 0)
+    sizes, groups = np.unique(half_widths, return_inverse=True)
+    for group, half_width in enumerate(sizes.tolist()):
+        members = np.flatnonzero((groups.ravel() == group) & (counts > 0))
+        owners = np.repeat(members, counts[members])
+        offsets = np.arange(len(owners)) - np.repeat(
+            np.cumsum(counts[members]) - counts[members], counts[members])
+        all_rows = firsts[owners] + offsets
+        chunk = max(cells // (2 * half_width + 1), 1)
+        for first in range(0, len(owners), chunk):
+            x, y, r = dots[owners[first:first + chunk]].T
+            rows = all_rows[first:first + chunk]
+            columns = (np.floor(x * width).astype(np.intp)[:, np.newaxis] +
+                       np.arange(-half_width, half_width + 1))
+            dx = (columns + 0.5) / width - x[:, np.newaxis]
+            dy = (rows + 0.5) / height - y
+            valid = (columns >= 0) & (columns < width)
+            index = (rows - top)[:, np.newaxis] * width + columns
+            yield r[:, np.newaxis], dx, dy[:, np.newaxis], valid, index
+
+
+def render_dots_on_plane_strip(dots, image_size, top, strip_height,
+                               antialias=False, long_run=32):
+    """
+    Renders the rows top to top + strip_height of a texture of dots on the
+    unit plane. Returns an uint8 array with black dots on white.
+    Pixels are covered if their center lies inside a dot. The covered runs
+    of all rows of all dots are computed at once. Runs of at least long_run
+    pixels are filled by slicing, all shorter runs by a single assignment to
+    their pixels, so small dots need no Python call each.
+
+    If antialias is set, edge pixels get gray values of their fractional
+    coverage. The distance of each pixel center to the dot edge is
+    converted to pixels with the length of the distance gradient in pixel
+    space. Only the pixels of the bounding box of each dot are visited, and
+    dots with bounding boxes of the same size are processed together.
+    """
+    width, height = image_size
+    strip_height = min(strip_height, height - top)
+    strip = np.full((strip_height, width), 255, dtype=np.uint8)
+    dots = util.as_dot_array(dots, 3)
+    if not antialias:
+        rows, starts, stops = _plane_dot_spans(dots, image_size, top,
+                                               strip_height)
+        lengths = stops - starts
+        long = lengths >= long_run
+        for row, start, stop in zip(rows[long].tolist(),
+                                    starts[long].tolist(),
+                                    stops[long].tolist()):
+            strip[row, start:stop] = 0
+        rows, starts, lengths = rows[~long], starts[~long], lengths[~long]
+        ends = np.cumsum(lengths)
+        pixels = (np.arange(ends[-1] if len(ends) else 0) +
+                  np.repeat(rows * width + starts - (ends - lengths), lengths))
+        strip.reshape(-1)[pixels] = 0
+        return strip
+    pixels = strip.reshape(-1)
+    for r, dx, dy, valid, index in _plane_dot_groups(dots, image_size, top,
+                                                     strip_height):
+        distance = np.hypot(dx, dy)
+        gradient = np.hypot(dx / width, dy / height)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            signed_distance = (distance - r) * distance / gradient
+        signed_distance = np.where(distance < r / 2, -1, signed_distance)
+        values = coverage_values(signed_distance)
+        pixels[index[valid & (values == 0)]] = 0
+        # Boxes of close dots overlap, keep the darkest value of each edge
+        # pixel.
+        edge = valid & (values > 0) & (values < 255)
+        np.minimum.at(pixels, index[edge], values[edge])
+    return strip
+
+
+def render_dots_on_plane(dots, image_size, workers=1, strip_height=256,
+                         antialias=False, periodic=False):
+    """
+    Renders dots on the unit plane into an array.
+
+    Parameters
+    ----------
+    dots : Array or iterable of (x, y, r) dots.
+    image_size : Tuple (width, height) of the texture.
+    workers : Number of processes rendering strips in parallel.
+              None uses all cores.
+    strip_height : Number of rows rendered by one task.
+    antialias : If True edge pixels get gray values of their coverage.
+    periodic : If True the dots are a periodic layout and dots crossing an
+               edge are also drawn on the opposite side.
+
+    Returns
+    -------
+    Array of uint8 with shape (height, width) with black dots on white.
+    """
+    if periodic:
+        dots = wrap_dots_on_plane(dots)
+    if workers == 1:
+        return render_dots_on_plane_strip(dots, image_size, 0, image_size[1],
+                                          antialias)
+    strips = bin_dots_by_strip(dots, image_size, strip_height)
+    strip_args = [(strip_dots, image_size, i * strip_height, strip_height,
+                   antialias)
+                  for i, strip_dots in enumerate(strips)]
+    return render_bands(render_dots_on_plane_strip, strip_args, strip_height,
+                        (image_size[1], image_size[0]), workers)
+
+
+def write_dots_on_plane(dots, image_size, filename, strip_height=256,
+                        workers=1, antialias=False, colors=None, bit_depth=8,
+                        periodic=False):
+    """
+    Renders dots on the unit plane into a PNG file one strip at a time.
+    Peak memory is bounded by the size of a strip, not of the image.
+    With several workers, one strip per worker is rendered in parallel into
+    a shared buffer before it is written.
+
+    Parameters
+    ----------
+    dots : Array or iterable of (x, y, r) dots.
+    image_size : Tuple (width, height) of the texture.
+    filename : Path of the PNG file.
+    strip_height : Number of rows rendered at once.
+    workers : Number of processes rendering strips in parallel.
+              None uses all cores.
+    antialias : If True edge pixels get gray values of their coverage.
+    colors : Tuple (fill, background) of RGB tuples applied when writing,
+             None writes black dots on white in grayscale.
+    bit_depth : 8 or 1 bits per pixel. Antialiased textures need 8 bits.
+    periodic : If True the dots are a periodic layout and dots crossing an
+               edge are also drawn on the opposite side.
+    """
+    if antialias and bit_depth != 8:
+        raise ValueError('Antialiased textures need a bit depth of 8')
+    if periodic:
+        dots = wrap_dots_on_plane(dots)
+    strips = bin_dots_by_strip(dots, image_size, strip_height)
+    with png_strip_writer(filename, image_size, colors=colors,
+                          bit_depth=bit_depth) as writer:
+        if workers == 1:
+            for i, strip_dots in enumerate(strips):
+                writer.write_rows(render_dots_on_plane_strip(
+                    strip_dots, image_size, i * strip_height, strip_height,
+                    antialias))
+            return
+        group_size = workers or os.cpu_count()
+        with ProcessPoolExecutor(group_size) as executor:
+            shape = (group_size * strip_height, image_size[0])
+            memory = shared_memory.SharedMemory(create=True,
+                                                size=int(np.prod(shape)))
+            try:
+                buffer = np.ndarray(shape, dtype=np.uint8, buffer=memory.buf)
+                for first in range(0, len(strips), group_size):
+                    group = strips[first:first + group_size]
+                    strip_args = [(strip_dots, image_size,
+                                   (first + i) * strip_height, strip_height,
+                                   antialias)
+                                  for i, strip_dots in enumerate(group)]
+                    render_bands_into(executor, render_dots_on_plane_strip,
+                                      strip_args, strip_height, memory, shape)
+                    rows = min(len(group) * strip_height,
+                               image_size[1] - first * strip_height)
+                    writer.write_rows(buffer[:rows])
+                del buffer
+            finally:
+                memory.close()
+                memory.unlink()
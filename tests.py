@@ -20,8 +20,19 @@
 # IN THE SOFTWARE
 #
 #******************************************************************************
+import os
+import tempfile
 import unittest
+import itertools
+import json
 import numpy as np
+from PIL import Image
+import util
+import render
+import cache
+import benchmark
+import textures
+import batch
 from util import cylindric_to_spheric, great_circle_distance
 
 
@@ -66,5 +77,563 @@ class CoordinateTransformationTest(unittest.TestCase):
         self.assert_longitude_transformation((0.5, 0), (0, -np.pi))
         self.assert_longitude_transformation((0.5, np.pi), (0, 0))
 
+class SpatialGridTest(unittest.TestCase):
+
+    def test_near_returns_adjacent_cells_only(self):
+        grid = util.spatial_grid(0.1)
+        grid.add((0.05, 0.05), 'a')
+        grid.add((0.15, 0.05), 'b')
+        grid.add((0.55, 0.55), 'c')
+        self.assertEqual(sorted(grid.near((0.06, 0.06))), ['a', 'b'])
+        self.assertEqual(list(grid.near((0.5, 0.5))), ['c'])
+
+
+class CellIndexTest(unittest.TestCase):
+
+    def test_near_matches_spatial_grid(self):
+        positions = np.random.default_rng(0).random((200, 2))
+        index = util.cell_index(0.1, 2)
+        grid = util.spatial_grid(0.1)
+        index.add(positions, positions)
+        for i, position in enumerate(positions):
+            grid.add(position, i)
+        query, near = index.near(positions[:20])
+        for i in range(20):
+            self.assertEqual(sorted(near[query == i]),
+                             sorted(grid.near(positions[i])))
+
+
+class PolygonSamplerTest(unittest.TestCase):
+
+    polygon = [(0.2, 0.2), (0.8, 0.2), (0.8, 0.8), (0.5, 0.4), (0.2, 0.8)]
+
+    def test_triangulation_covers_polygon(self):
+        triangles = util.triangulate_polygon(self.polygon)
+        self.assertEqual(len(triangles), 3)
+        edges = triangles[:, 1:] - triangles[:, :1]
+        areas = np.abs(edges[:, 0, 0] * edges[:, 1, 1] -
+                       edges[:, 0, 1] * edges[:, 1, 0]) / 2
+        self.assertAlmostEqual(areas.sum(), 0.36 - 0.12)
+
+    def test_samples_lie_in_scaled_polygon(self):
+        sampler = util.polygon_sampler(self.polygon)
+        uniform = np.random.default_rng(0).random((500, 3))
+        for scale in (1, 0.5):
+            for x, y in sampler.sample(uniform, scale):
+                self.assertTrue(sampler.contains(x, y, scale))
+        self.assertFalse(sampler.contains(0.5, 0.6))
+        self.assertFalse(sampler.contains(0.25, 0.25, 0.5))
+
+
+class DotIterationTest(unittest.TestCase):
+
+    def assert_no_overlap(self, iterator, dots):
+        self.assertTrue(len(dots) > 1)
+        for p1, p2 in itertools.combinations(dots, 2):
+            self.assertFalse(iterator.point_distance_valid(p1, p2))
+
+    def test_plane_dots_do_not_overlap(self):
+        iterator = util.iter_dots_on_plane([0.05] * 50 + [0.02] * 50, 0.05,
+                                           1.05, allowed_misses=500)
+        self.assert_no_overlap(iterator, list(iterator))
+
+    def test_sphere_dots_do_not_overlap(self):
+        iterator = util.iter_dots_on_sphere(0.3, 100, allowed_misses=500)
+        self.assert_no_overlap(iterator, list(iterator))
+
+    def test_sphere_distance_checks_match_great_circle_distance(self):
+        iterator = util.iter_dots_on_sphere(0.3, 0)
+        points = [(0, np.pi - 0.1), (0, -np.pi + 0.1), (0, -np.pi + 0.2),
+                  (np.pi / 2, 0), (np.pi / 2 - 0.2, 2), (-np.pi / 2, 1),
+                  (-np.pi / 2 + 0.29, -2), (0.1, 0.2)]
+        for p1, p2 in itertools.combinations(points, 2):
+            self.assertEqual(iterator.point_distance_valid(p1, p2),
+                             util.great_circle_distance(p1, p2) < 0.3)
+
+    def test_batched_plane_dots_do_not_overlap(self):
+        iterator = util.iter_dots_on_plane([0.05] * 50 + [0.02] * 200, 0.05,
+                                           1.05, allowed_misses=500,
+                                           batch_size=64)
+        dots = list(iterator)
+        self.assert_no_overlap(iterator, dots)
+        self.assertEqual(sorted(r for x, y, r in dots),
+                         sorted(iterator.radii[:len(dots)]))
+
+    def test_batches_keep_no_scalar_grid(self):
+        for iterator in (util.iter_dots_on_plane([0.02] * 100, batch_size=64),
+                         util.iter_dots_on_sphere(0.3, 50, batch_size=64)):
+            self.assertTrue(len(util.layout_array(iterator)) > 1)
+            self.assertEqual(len(iterator.grid.cells), 0)
+
+    def test_periodic_plane_dots_do_not_overlap_across_edges(self):
+        radii = [0.05] * 50 + [0.02] * 200
+        for factory, batch_size in ((util.iter_dots_on_plane, None),
+                                    (util.iter_dots_on_plane, 64),
+                                    (util.iter_poisson_dots_on_plane, None)):
+            dots = list(factory(radii, 0, 1.05, allowed_misses=500,
+                                batch_size=batch_size, periodic=True, seed=0))
+            self.assertTrue(len(dots) > 100)
+            for (x1, y1, r1), (x2, y2, r2) in itertools.combinations(dots, 2):
+                dx = min(abs(x1 - x2), 1 - abs(x1 - x2))
+                dy = min(abs(y1 - y2), 1 - abs(y1 - y2))
+                self.assertTrue(np.hypot(dx, dy) >= (r1 + r2) * 1.05)
+            self.assertTrue(any(x < r or x > 1 - r for x, y, r in dots))
+        with self.assertRaises(ValueError):
+            util.iter_dots_on_plane(radii, 0.1, periodic=True)
+
+    def test_polygon_dots_do_not_overlap(self):
+        polygon = PolygonSamplerTest.polygon
+        sampler = util.polygon_sampler(polygon)
+        for batch_size in (None, 64):
+            iterator = util.iter_dots_in_polygon(polygon, [0.03] * 100, 0,
+                                                 1.05, allowed_misses=200,
+                                                 batch_size=batch_size)
+            dots = list(iterator)
+            self.assert_no_overlap(iterator, dots)
+            for x, y, r in dots:
+                self.assertTrue(sampler.contains(x, y,
+                                                 iterator.inset_scale(r)))
+
+    def test_batched_sphere_dots_do_not_overlap(self):
+        iterator = util.iter_dots_on_sphere(0.3, 100, allowed_misses=500,
+                                            batch_size=64)
+        dots = list(iterator)
+        self.assert_no_overlap(iterator, dots)
+        self.assertTrue(len(dots) <= 100)
+
+    def test_seeded_iterators_are_reproducible(self):
+        for batch_size in (None, 32):
+            layouts = [list(util.iter_dots_on_plane([0.05] * 30, 0.05, 1.05,
+                                                    allowed_misses=100,
+                                                    batch_size=batch_size,
+                                                    seed=3))
+                       for _ in range(2)]
+            self.assertEqual(layouts[0], layouts[1])
+        layouts = [list(util.iter_poisson_dots_on_sphere(0.3, 100, seed=5))
+                   for _ in range(2)]
+        self.assertEqual(layouts[0], layouts[1])
+
+    def test_interrupted_runs_resume_from_checkpoints(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for batch_size, factory in ((None, util.iter_dots_on_sphere),
+                                        (16, util.iter_dots_on_sphere),
+                                        (None, util.iter_poisson_dots_on_sphere)):
+                checkpoint = os.path.join(directory, 'run.npz')
+                expected = list(factory(0.3, 100, allowed_misses=200,
+                                        batch_size=batch_size, seed=2))
+                interrupted = factory(0.3, 100, allowed_misses=200,
+                                      batch_size=batch_size, seed=2,
+                                      checkpoint=checkpoint,
+                                      checkpoint_interval=0)
+                self.assertEqual(list(itertools.islice(interrupted, 40)),
+                                 expected[:40])
+                resumed = factory(0.3, 100, allowed_misses=200,
+                                  batch_size=batch_size, seed=2,
+                                  checkpoint=checkpoint)
+                self.assertEqual(list(resumed), expected)
+                os.remove(checkpoint)
+
+    def test_checkpoints_extend_layouts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, 'run.npz')
+            dots = list(util.iter_dots_on_plane([0.05] * 20, 0, 1.05,
+                                                allowed_misses=5, seed=1,
+                                                checkpoint=checkpoint))
+            radii = [0.05] * 20 + [0.02] * 100
+            iterator = util.iter_dots_on_plane(radii, 0, 1.05,
+                                               allowed_misses=500, seed=1,
+                                               checkpoint=checkpoint)
+            extended = list(iterator)
+            self.assertEqual(extended[:len(dots)], dots)
+            self.assertTrue(len(extended) > len(dots))
+            self.assert_no_overlap(iterator, extended)
+            with self.assertRaises(ValueError):
+                list(util.iter_dots_on_plane(radii, 0, 1.05, seed=2,
+                                             checkpoint=checkpoint))
+
+    def test_stats_are_collected(self):
+        for batch_size in (None, 32):
+            reports = []
+            stats = util.placement_stats(
+                lambda stats, iterator: reports.append(stats.accepted), 0)
+            iterator = util.iter_dots_on_plane([0.05] * 100, 0, 1.05,
+                                               allowed_misses=50,
+                                               batch_size=batch_size,
+                                               stats=stats)
+            dots = list(iterator)
+            self.assertEqual(stats.accepted, len(dots))
+            self.assertEqual(sum(stats.miss_histogram.values()), len(dots))
+            self.assertTrue(stats.misses >= 50)
+            self.assertTrue(stats.distance_checks > 0)
+            self.assertEqual(reports[-1], len(dots))
+
+    def test_poisson_plane_dots_do_not_overlap(self):
+        iterator = util.iter_poisson_dots_on_plane([0.05] * 50 + [0.02] * 200,
+                                                   0.05, 1.05,
+                                                   allowed_misses=500)
+        dots = list(iterator)
+        self.assert_no_overlap(iterator, dots)
+        for x, y, r in dots:
+            self.assertTrue(0.05 <= x <= 0.95 and 0.05 <= y <= 0.95)
+
+    def test_saturated_poisson_runs_stop_without_warning(self):
+        iterator = util.iter_poisson_dots_on_plane([0.02] * 5000, seed=1)
+        with self.assertLogs(level='INFO') as logs:
+            dots = list(iterator)
+        self.assertTrue(0 < len(dots) < 5000)
+        self.assertEqual([record.levelname for record in logs.records],
+                         ['INFO'])
+
+    def test_poisson_iterators_reject_batches(self):
+        with self.assertRaises(ValueError):
+            util.iter_poisson_dots_on_plane([0.05] * 10, batch_size=16)
+        with self.assertRaises(ValueError):
+            util.iter_poisson_dots_on_sphere(0.3, 10, batch_size=16)
+
+    def test_poisson_sphere_dots_do_not_overlap(self):
+        iterator = util.iter_poisson_dots_on_sphere(0.3, 500, allowed_misses=500)
+        dots = list(iterator)
+        self.assert_no_overlap(iterator, dots)
+        for latitude, longitude in dots:
+            self.assertTrue(-np.pi / 2 <= latitude <= np.pi / 2)
+            self.assertTrue(-np.pi <= longitude < np.pi)
+
+
+class LayoutCacheTest(unittest.TestCase):
+
+    def test_layouts_are_cached_by_parameters(self):
+        with tempfile.TemporaryDirectory() as directory:
+            layouts = cache.layout_cache(directory)
+            iterator = util.iter_dots_on_plane([0.05] * 20, seed=1)
+            dots = layouts.dots(iterator)
+            self.assertEqual(len(os.listdir(directory)), 1)
+            iterator = util.iter_dots_on_plane([0.05] * 20, seed=1)
+            np.testing.assert_array_equal(layouts.dots(iterator), dots)
+            self.assertEqual(len(iterator.dots), 0)
+            layouts.dots(util.iter_dots_on_plane([0.05] * 20, seed=2))
+            layouts.dots(util.iter_dots_on_plane([0.05] * 20))
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+    def test_least_recently_used_layouts_are_evicted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            layouts = cache.layout_cache(directory, max_bytes=1000)
+            layouts.store('a', np.zeros((20, 3)))
+            os.utime(layouts.path('a'), (0, 0))
+            layouts.store('b', np.zeros((20, 3)))
+            self.assertIsNone(layouts.load('a'))
+            self.assertIsNotNone(layouts.load('b'))
+
+
+class TexturesTest(unittest.TestCase):
+
+    def test_render_functions_return_textures(self):
+        plane = textures.render_plane([0.1] * 5, (64, 32), seed=1)
+        self.assertEqual(plane.shape, (32, 64))
+        polygon = textures.render_polygon(PolygonSamplerTest.polygon,
+                                          [0.05] * 5, (32, 32), seed=1,
+                                          method='batch')
+        self.assertEqual(polygon.shape, (32, 32))
+        sphere = textures.render_sphere(0.5, 10, 0.2, (64, 32), seed=1,
+                                        method='poisson')
+        self.assertEqual(sphere.shape, (32, 64))
+        self.assertTrue((sphere == 0).any())
+
+    def test_colors_require_a_filename(self):
+        with self.assertRaises(ValueError):
+            textures.render_plane([0.1] * 5, (64, 32), seed=1,
+                                  colors=((255, 0, 0), (0, 0, 255)))
+        with self.assertRaises(ValueError):
+            textures.draw_plane_dots([(0.5, 0.5, 0.1)], (64, 32), bit_depth=1)
+
+    def test_cube_map_with_mip_levels_is_written(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'cube_{face}_{level}.png')
+            faces = textures.render_cube(0.5, 10, 0.2, 16, filename, seed=1,
+                                         mipmaps=True)
+            self.assertEqual(faces.shape, (6, 16, 16))
+            self.assertEqual(len(os.listdir(directory)), 6 * 5)
+            with Image.open(filename.format(face='nz', level=2)) as image:
+                self.assertEqual(image.size, (4, 4))
+
+    def test_filenames_without_fields_are_rejected(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'texture.png')
+            with self.assertRaises(ValueError):
+                textures.render_sphere(0.5, 10, 0.2, (64, 32), filename,
+                                       seed=1, mipmaps=True)
+            with self.assertRaises(ValueError):
+                textures.render_cube(0.5, 10, 0.2, 16, filename, seed=1)
+            with self.assertRaises(ValueError):
+                textures.render_cube(0.5, 10, 0.2, 16,
+                                     os.path.join(directory, '{face}.png'),
+                                     seed=1, mipmaps=True)
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_manifest_jobs_are_written(self):
+        with tempfile.TemporaryDirectory() as directory:
+            jobs = [{'type': 'plane', 'radii': [0.1] * 5,
+                     'image_size': [64, 32],
+                     'filename': os.path.join(directory, 'plane.png')},
+                    {'type': 'sphere', 'min_distance': 0.5, 'n': 10,
+                     'dot_r': 0.2, 'image_size': [64, 32],
+                     'filename': os.path.join(directory, 'sphere.png')}]
+            manifest = os.path.join(directory, 'manifest.json')
+            with open(manifest, 'w') as f:
+                json.dump(jobs, f)
+            self.assertEqual(textures.main([manifest]), 0)
+            for job in jobs:
+                with Image.open(job['filename']) as image:
+                    self.assertEqual(image.size, (64, 32))
+
+
+class BatchTest(unittest.TestCase):
+
+    def test_jobs_share_layouts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            layout = {'type': 'plane', 'radii': [0.1] * 5, 'seed': 4}
+            jobs = [dict(layout, image_size=[64, 64],
+                         filename=os.path.join(directory, 'small.png')),
+                    dict(layout, image_size=[128, 128], antialias=True,
+                         filename=os.path.join(directory, 'large.png')),
+                    {'type': 'sphere', 'min_distance': 0.5, 'n': 10,
+                     'dot_r': 0.2, 'image_size': [64, 32], 'unknown': 1,
+                     'filename': os.path.join(directory, 'failed.png')},
+                    {'type': 'sphere', 'min_distance': 0.5, 'n': 10,
+                     'dot_r': 0.2, 'image_size': [64, 32], 'seed': 2,
+                     'filename': os.path.join(directory, 'sphere.png')},
+                    {'type': 'cube', 'min_distance': 0.5, 'n': 10,
+                     'dot_r': 0.2, 'face_size': 16, 'seed': 2,
+                     'filename': os.path.join(directory, 'cube_{face}.png')}]
+            reports = batch.run_jobs(jobs, workers=2)
+            self.assertEqual([report['shared_layout'] for report in reports],
+                             [False, True, False, False, True])
+            self.assertEqual([report['error'] is None for report in reports],
+                             [True, True, False, True, True])
+            self.assertIn('unknown', reports[2]['error'])
+            with Image.open(jobs[0]['filename']) as small, \
+                    Image.open(jobs[1]['filename']) as large:
+                small = np.asarray(small)
+                large = np.asarray(large.resize((64, 64), Image.BOX))
+                self.assertTrue(np.mean(np.abs(small - large.astype(int)) < 128)
+                                > 0.95)
+
+    def test_unseeded_and_invalid_jobs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            layout = {'type': 'plane', 'radii': [0.1] * 5,
+                      'image_size': [32, 32]}
+            jobs = [dict(layout, filename=os.path.join(directory, 'a.png')),
+                    dict(layout, filename=os.path.join(directory, 'b.png')),
+                    {'radii': [0.1], 'filename': 'untyped.png'},
+                    {'type': 'cone', 'filename': 'cone.png'}]
+            reports = batch.run_jobs(jobs, workers=2)
+            self.assertEqual([report['shared_layout'] for report in reports],
+                             [False, False, False, False])
+            self.assertEqual([report['error'] is None for report in reports],
+                             [True, True, False, False])
+            self.assertIn('cone', reports[3]['error'])
+
+
+class BenchmarkComparisonTest(unittest.TestCase):
+
+    def test_regressions_beyond_tolerance_are_reported(self):
+        baseline = [{'benchmark': 'placement', 'kind': 'plane', 'n': 10,
+                     'dots_per_second': 100.},
+                    {'benchmark': 'render', 'kind': 'sphere', 'n': 10,
+                     'megapixels_per_second': 10., 'peak_rss_mb': 100.}]
+        results = [{'benchmark': 'placement', 'kind': 'plane', 'n': 10,
+                    'dots_per_second': 80.},
+                   {'benchmark': 'render', 'kind': 'sphere', 'n': 10,
+                    'megapixels_per_second': 20., 'peak_rss_mb': 150.}]
+        regressions = benchmark.compare_results(results, baseline, 0.25)
+        self.assertEqual([(name, metric) for name, metric, _, _ in regressions],
+                         [('render/sphere/10', 'peak_rss_mb')])
+
+
+class SphereRasterizationTest(unittest.TestCase):
+
+    def test_matches_full_image_distances(self):
+        image_size = 128, 64
+        dot_r = 0.3
+        dots = [(0, 0), (0.2, -3.1), (1.4, 1), (-1.5, 2), (-0.7, 3.14)]
+        latitudes, longitudes = render.sphere_pixel_coordinates(image_size)
+        grid = np.meshgrid(latitudes, longitudes, indexing='ij')
+        distances = np.min([great_circle_distance(grid, dot) for dot in dots],
+                           axis=0)
+        expected = np.where(distances < dot_r, 0, 255)
+        texture = render.rasterize_dots_on_sphere(dots, dot_r, image_size)
+        np.testing.assert_array_equal(texture, expected)
+
+    def test_antialiased_edges(self):
+        image_size = 256, 128
+        dots = [(0, 0), (0.2, -3.1), (1.4, 1), (-1.5, 2), (-0.7, 3.14)]
+        hard = render.rasterize_dots_on_sphere(dots, 0.3, image_size)
+        smooth = render.rasterize_dots_on_sphere(dots, 0.3, image_size,
+                                                 antialias=True)
+        gray = (smooth > 0) & (smooth < 255)
+        self.assertTrue(gray.any())
+        self.assertTrue(np.all((smooth == 0) <= (hard == 0)))
+        self.assertTrue(np.all((smooth == 255) <= (hard == 255)))
+        self.assertTrue(np.mean((smooth < 128) == (hard == 0)) > 0.99)
+
+    def test_parallel_matches_serial(self):
+        image_size = 128, 64
+        dots = [(0, 0), (0.2, -3.1), (1.4, 1), (-1.5, 2), (-0.7, 3.14)]
+        serial = render.rasterize_dots_on_sphere(dots, 0.3, image_size)
+        parallel = render.rasterize_dots_on_sphere(dots, 0.3, image_size,
+                                                   workers=2, band_height=8)
+        np.testing.assert_array_equal(parallel, serial)
+
+    def test_single_row_textures(self):
+        for antialias in (False, True):
+            texture = render.rasterize_dots_on_sphere([(0, 0)], 0.3, (64, 1),
+                                                      antialias=antialias)
+            self.assertEqual(texture.shape, (1, 64))
+
+
+class CubeMapRenderingTest(unittest.TestCase):
+
+    dots = [(0, 0), (0.2, -3.1), (1.4, 1), (-1.5, 2), (-0.7, 3.14),
+            (0.6, 0.785)]
+
+    def test_matches_all_texel_directions(self):
+        face_size = 32
+        coordinates = (np.arange(face_size) + 0.5) / face_size * 2 - 1
+        us, vs = np.meshgrid(coordinates, coordinates)
+        # Caps of large dots contain the normals of the faces they touch,
+        # dots beyond pi / 2 are the area outside of their outline.
+        for dots, dot_r in ((self.dots, 0.4), (self.dots, 1.0),
+                            (self.dots, 1.4), ([(0.32, 1.42)], 2.4),
+                            ([(-1.45, 1.94)], 2.97)):
+            centers = np.array([util.spheric_to_cartesian(*dot)
+                                for dot in dots])
+            faces = render.rasterize_dots_on_cube(dots, dot_r, face_size)
+            for face, (normal, column_axis, row_axis) in enumerate(
+                    render.cube_face_axes):
+                directions = (normal + us[..., np.newaxis] * column_axis +
+                              vs[..., np.newaxis] * row_axis)
+                directions /= np.linalg.norm(directions, axis=-1,
+                                             keepdims=True)
+                covered = (directions.dot(centers.T) >
+                           np.cos(dot_r)).any(axis=-1)
+                np.testing.assert_array_equal(faces[face],
+                                              np.where(covered, 0, 255))
+
+    def test_antialiased_edges(self):
+        hard = render.rasterize_dots_on_cube(self.dots, 0.4, 64)
+        smooth = render.rasterize_dots_on_cube(self.dots, 0.4, 64,
+                                               antialias=True)
+        self.assertTrue(((smooth > 0) & (smooth < 255)).any())
+        self.assertTrue(np.mean((smooth < 128) == (hard == 0)) > 0.99)
+
+    def test_mip_chain(self):
+        levels = render.mip_chain(np.array([[0, 255, 255], [255, 255, 255]],
+                                           dtype=np.uint8))
+        self.assertEqual([level.shape for level in levels],
+                         [(2, 3), (1, 2), (1, 1)])
+        np.testing.assert_array_equal(levels[1], [[191, 255]])
+
+
+class PlaneStripRenderingTest(unittest.TestCase):
+
+    def test_matches_full_image_rendering(self):
+        image_size = 100, 70
+        dots = [(0.5, 0.5, 0.2), (0.1, 0.9, 0.15), (0.8, 0.13, 0.1),
+                (0.3, 0.25, 0.05)]
+        rows, columns = np.mgrid[:image_size[1], :image_size[0]]
+        image = np.full(rows.shape, 255, dtype=np.uint8)
+        for x, y, r in dots:
+            image[((columns + 0.5) / image_size[0] - x) ** 2 +
+                  ((rows + 0.5) / image_size[1] - y) ** 2 < r ** 2] = 0
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'texture.png')
+            render.write_dots_on_plane(dots, image_size, filename,
+                                       strip_height=16)
+            with Image.open(filename) as written:
+                self.assertEqual(written.mode, 'L')
+                np.testing.assert_array_equal(np.asarray(written), image)
+            render.write_dots_on_plane(dots, image_size, filename,
+                                       strip_height=16, workers=2)
+            with Image.open(filename) as written:
+                np.testing.assert_array_equal(np.asarray(written), image)
+        parallel = render.render_dots_on_plane(dots, image_size, workers=2,
+                                               strip_height=16)
+        np.testing.assert_array_equal(parallel, image)
+
+    def test_antialiased_edges(self):
+        image_size = 100, 70
+        dots = [(0.5, 0.5, 0.2), (0.1, 0.9, 0.15), (0.8, 0.13, 0.1)]
+        hard = render.render_dots_on_plane(dots, image_size)
+        smooth = render.render_dots_on_plane(dots, image_size, antialias=True)
+        gray = (smooth > 0) & (smooth < 255)
+        self.assertTrue(gray.any())
+        self.assertEqual(smooth[35, 50], 0)
+        self.assertEqual(smooth[35, 5], 255)
+        self.assertTrue(np.mean((smooth < 128) == (hard == 0)) > 0.99)
+        # Gray pixels lie on the edges of the dots.
+        self.assertTrue(gray.mean() < 0.1)
+
+    def test_antialiased_gray_pixels_lie_on_edges(self):
+        image_size = 100, 70
+        dots = [(0.5, 0.5, 0.2), (0.1, 0.9, 0.15), (0.8, 0.13, 0.1)]
+        smooth = render.render_dots_on_plane(dots, image_size, antialias=True)
+        rows, columns = np.mgrid[:image_size[1], :image_size[0]]
+        # Distance of every pixel center to the closest dot edge in pixels.
+        edge_distance = np.full(rows.shape, np.inf)
+        for x, y, r in dots:
+            angle = np.arctan2((rows + 0.5) / image_size[1] - y,
+                               (columns + 0.5) / image_size[0] - x)
+            distance = np.hypot((columns + 0.5) - x * image_size[0],
+                                (rows + 0.5) - y * image_size[1])
+            edge = np.hypot(r * image_size[0] * np.cos(angle),
+                            r * image_size[1] * np.sin(angle))
+            edge_distance = np.minimum(edge_distance, np.abs(distance - edge))
+        gray = (smooth > 0) & (smooth < 255)
+        self.assertTrue(gray.any())
+        self.assertTrue((edge_distance[gray] < 1).all())
+
+    def test_periodic_textures_tile_seamlessly(self):
+        image_size = 64, 48
+        dots = [(0.02, 0.5, 0.1), (0.95, 0.97, 0.08), (0.5, 0.5, 0.1)]
+        texture = render.render_dots_on_plane(dots, image_size, periodic=True)
+        rows, columns = np.mgrid[:image_size[1], :image_size[0]]
+        expected = np.full(rows.shape, 255, dtype=np.uint8)
+        for x, y, r in dots:
+            dx = np.abs((columns + 0.5) / image_size[0] - x)
+            dy = np.abs((rows + 0.5) / image_size[1] - y)
+            dx = np.minimum(dx, 1 - dx)
+            dy = np.minimum(dy, 1 - dy)
+            expected[dx ** 2 + dy ** 2 < r ** 2] = 0
+        np.testing.assert_array_equal(texture, expected)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'texture.png')
+            render.write_dots_on_plane(dots, image_size, filename,
+                                       strip_height=16, periodic=True)
+            with Image.open(filename) as written:
+                np.testing.assert_array_equal(np.asarray(written), expected)
+
+    def test_colors_and_bit_depth_are_applied_when_writing(self):
+        image_size = 100, 70
+        dots = [(0.5, 0.5, 0.2), (0.1, 0.9, 0.15)]
+        hard = render.render_dots_on_plane(dots, image_size)
+        colors = (255, 0, 0), (0, 0, 255)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'texture.png')
+            for bit_depth in (8, 1):
+                render.write_dots_on_plane(dots, image_size, filename,
+                                           strip_height=16, colors=colors,
+                                           bit_depth=bit_depth)
+                with Image.open(filename) as written:
+                    self.assertEqual(written.mode, 'P')
+                    rgb = np.asarray(written.convert('RGB'))
+                self.assertTrue((rgb[hard == 0] == colors[0]).all())
+                self.assertTrue((rgb[hard == 255] == colors[1]).all())
+            render.write_dots_on_plane(dots, image_size, filename,
+                                       bit_depth=1)
+            with Image.open(filename) as written:
+                self.assertEqual(written.mode, '1')
+                np.testing.assert_array_equal(np.asarray(written),
+                                              hard == 255)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,334 @@
+#******************************************************************************
+# Copyright (C) 2013 Michael Mauderer <mail@MichaelMauderer.de>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all  copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE
+#
+#******************************************************************************
+"""
+Library interface and command line tool for rendering polka dot textures.
+
+The command line tool renders all textures of a job manifest in a single
+process. A manifest is a JSON file containing a list of jobs, each job is
+an object with the type of the texture ("plane", "polygon", "sphere" or
+"cube") and the keyword arguments of the corresponding render function:
+
+    [{"type": "sphere", "min_distance": 0.25, "n": 150, "dot_r": 0.1,
+      "image_size": [2048, 1024], "filename": "sphere.png", "seed": 1}]
+
+Usage: python textures.py manifest.json
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from PIL import Image
+import util
+import render
+import cache
+
+plane_iterators = {'random': util.iter_dots_on_plane,
+                   'batch': util.iter_dots_on_plane,
+                   'poisson': util.iter_poisson_dots_on_plane}
+polygon_iterators = {'random': util.iter_dots_in_polygon,
+                     'batch': util.iter_dots_in_polygon,
+                     'poisson': util.iter_poisson_dots_in_polygon}
+sphere_iterators = {'random': util.iter_dots_on_sphere,
+                    'batch': util.iter_dots_on_sphere,
+                    'poisson': util.iter_poisson_dots_on_sphere}
+
+
+def create_dots(iterators, method, args, iterator_args, cache_directory):
+    """
+    Returns the array of dots created by the iterator for the method.
+    Layouts of seeded iterators are taken from the cache if a cache
+    directory is given.
+    """
+    if method == 'batch':
+        iterator_args.setdefault('batch_size', 1024)
+    iterator = iterators[method](*args, **iterator_args)
+    if cache_directory is not None:
+        return cache.layout_cache(cache_directory).dots(iterator)
+    return util.layout_array(iterator)
+
+
+def plane_dots(radii, border_distance=0, dot_distance_factor=1.05,
+               method='random', cache_directory=None, **iterator_args):
+    """
+    Returns the dots of a layout on the unit plane.
+    See `util.iter_dots_on_plane` for the parameters.
+    method selects the placement: 'random', 'batch' or 'poisson'.
+    """
+    return create_dots(plane_iterators, method,
+                       (radii, border_distance, dot_distance_factor),
+                       iterator_args, cache_directory)
+
+
+def polygon_dots(polygon, radii, border_distance=0, dot_distance_factor=1.05,
+                 method='random', cache_directory=None, **iterator_args):
+    """
+    Returns the dots of a layout in a polygon.
+    See `util.iter_dots_in_polygon` for the parameters.
+    method selects the placement: 'random', 'batch' or 'poisson'.
+    """
+    return create_dots(polygon_iterators, method,
+                       (polygon, radii, border_distance, dot_distance_factor),
+                       iterator_args, cache_directory)
+
+
+def sphere_dots(min_distance, n, method='random', cache_directory=None,
+                **iterator_args):
+    """
+    Returns the dots of a layout on the unit sphere.
+    See `util.iter_dots_on_sphere` for the parameters.
+    method selects the placement: 'random', 'batch' or 'poisson'.
+    """
+    return create_dots(sphere_iterators, method, (min_distance, n),
+                       iterator_args, cache_directory)
+
+
+def draw_plane_dots(dots, image_size, filename=None, workers=1,
+                    antialias=False, colors=None, bit_depth=8, periodic=False):
+    """
+    Renders dots on the unit plane. If a filename is given the texture is
+    streamed into it with the given colors and bit depth, see
+    `render.write_dots_on_plane`, and None is returned. Otherwise the
+    texture is returned as uint8 array of shape (height, width). Colors and
+    bit depths other than 8 are only supported with a filename.
+    """
+    if filename is None and (colors is not None or bit_depth != 8):
+        raise ValueError('Colors and bit depth are only applied to textures '
+                         'written to a file')
+    image_size = tuple(image_size)
+    if filename is not None:
+        render.write_dots_on_plane(dots, image_size, filename,
+                                   workers=workers, antialias=antialias,
+                                   colors=colors, bit_depth=bit_depth,
+                                   periodic=periodic)
+        return None
+    return render.render_dots_on_plane(dots, image_size, workers,
+                                       antialias=antialias, periodic=periodic)
+
+
+def _check_filename_fields(filename, fields):
+    """
+    Raises a ValueError if the filename lacks any of the given fields, which
+    would write several images to the same path.
+    """
+    for field in fields:
+        if '{' + field + '}' not in filename:
+            raise ValueError('The filename must contain a {{{0}}} field: '
+                             '{1}'.format(field, filename))
+
+
+def save_texture(texture, filename, mipmaps=False):
+    """
+    Saves a texture array. If mipmaps is set all levels of its mip chain are
+    saved, the filename must then contain a '{level}' field or a ValueError
+    is raised.
+    """
+    if not mipmaps:
+        Image.fromarray(texture).save(filename)
+        return
+    _check_filename_fields(filename, ['level'])
+    for level, image in enumerate(render.mip_chain(texture)):
+        Image.fromarray(image).save(filename.format(level=level))
+
+
+def draw_sphere_dots(dots, dot_r, image_size, filename=None, workers=1,
+                     antialias=False, mipmaps=False):
+    """
+    Renders dots on the unit sphere into a cylindric projection texture.
+    Returns the texture as uint8 array of shape (height, width) and saves it
+    if a filename is given, see `save_texture`.
+    """
+    if filename is not None and mipmaps:
+        _check_filename_fields(filename, ['level'])
+    texture = render.rasterize_dots_on_sphere(dots, dot_r, tuple(image_size),
+                                              workers, antialias=antialias)
+    if filename is not None:
+        save_texture(texture, filename, mipmaps)
+    return texture
+
+
+def draw_cube_dots(dots, dot_r, face_size, filename=None, antialias=False,
+                   mipmaps=False):
+    """
+    Renders dots on the unit sphere into the faces of a cube map.
+    Returns the faces as uint8 array of shape (6, face_size, face_size) and
+    saves them if a filename is given. The filename must contain a '{face}'
+    field that is replaced by the face names of `render.cube_face_names`,
+    see `save_texture` for mipmaps. Missing fields raise a ValueError before
+    anything is rendered.
+    """
+    if filename is not None:
+        _check_filename_fields(filename, ['face', 'level'] if mipmaps
+                               else ['face'])
+    faces = render.rasterize_dots_on_cube(dots, dot_r, face_size, antialias)
+    if filename is not None:
+        for name, face in zip(render.cube_face_names, faces):
+            save_texture(face, filename.replace('{face}', name), mipmaps)
+    return faces
+
+
+def render_plane(radii, image_size, filename=None, border_distance=0,
+                 dot_distance_factor=1.05, workers=1, antialias=False,
+                 colors=None, bit_depth=8, periodic=False, **layout_args):
+    """
+    Creates a texture of polka dots on a plane.
+
+    Parameters
+    ----------
+    radii : List containing the radii of all dots that should be created
+    image_size : Tuple (width, height) of the texture.
+    filename : Path the texture is written to. If given the texture is
+               streamed to the file and None is returned.
+    border_distance : Minimal distance between points and edge of texture.
+    dot_distance_factor: Factor that radii will be multiplied with before
+                         checking if two dots are far enough apart.
+    workers : Number of rendering processes, None uses all cores.
+    antialias : If True edge pixels get gray values of their coverage.
+    colors : Tuple (fill, background) of RGB tuples the texture is written
+             with, None for black dots on white in grayscale. Requires a
+             filename.
+    bit_depth : Bits per pixel of the written texture, 8 or 1. Other bit
+                depths than 8 require a filename.
+    periodic : If True the texture tiles seamlessly, border_distance must
+               then be 0.
+    layout_args : Further arguments of `plane_dots`.
+
+    Returns
+    -------
+    Array of uint8 with shape (height, width) or None.
+    """
+    dots = plane_dots(radii, border_distance, dot_distance_factor,
+                      periodic=periodic, **layout_args)
+    return draw_plane_dots(dots, image_size, filename, workers, antialias,
+                           colors, bit_depth, periodic)
+
+
+def render_polygon(polygon, radii, image_size, filename=None,
+                   border_distance=0, dot_distance_factor=1.05, workers=1,
+                   antialias=False, colors=None, bit_depth=8, **layout_args):
+    """
+    Creates a texture of polka dots that are bounded by a polygon.
+
+    Parameters
+    ----------
+    polygon: List of points that describe the polygon
+
+    For all other parameters see `render_plane`.
+    """
+    dots = polygon_dots(polygon, radii, border_distance, dot_distance_factor,
+                        **layout_args)
+    return draw_plane_dots(dots, image_size, filename, workers, antialias,
+                           colors, bit_depth)
+
+
+def render_sphere(min_distance, n, dot_r, image_size, filename=None,
+                  workers=1, antialias=False, mipmaps=False, **layout_args):
+    """
+    Creates a texture containing the cylindric projection of a sphere covered
+    in polka dots.
+
+    Parameters
+    ----------
+    min_distance : Minimal distance between the dot centers.
+    n : Maximum number of dots to create
+    dot_r : Radius of the dots as great circle distance.
+    image_size : Tuple (width, height) of the texture.
+    filename : Path the texture is written to.
+    workers : Number of rendering processes, None uses all cores.
+    antialias : If True edge pixels get gray values of their coverage.
+    mipmaps : If True all levels of the mip chain are written, filename
+              must contain a '{level}' field.
+    layout_args : Further arguments of `sphere_dots`.
+
+    Returns
+    -------
+    Array of uint8 with shape (height, width).
+    """
+    dots = sphere_dots(min_distance, n, **layout_args)
+    return draw_sphere_dots(dots, dot_r, image_size, filename, workers,
+                            antialias, mipmaps)
+
+
+def render_cube(min_distance, n, dot_r, face_size, filename=None,
+                antialias=False, mipmaps=False, **layout_args):
+    """
+    Creates the six faces of a cube map of a sphere covered in polka dots.
+    The faces follow the OpenGL layout in the frame of the sphere layout,
+    where z points to the north pole. The poles therefore lie on the pz and
+    nz faces. Engines with a y-up frame have to swap the faces accordingly.
+
+    Parameters
+    ----------
+    face_size : Edge length of the faces in texels.
+    filename : Path the faces are written to, '{face}' is replaced by the
+               name of the face.
+
+    For all other parameters see `render_sphere`.
+
+    Returns
+    -------
+    Array of uint8 with shape (6, face_size, face_size).
+    """
+    dots = sphere_dots(min_distance, n, **layout_args)
+    return draw_cube_dots(dots, dot_r, face_size, filename, antialias,
+                          mipmaps)
+
+
+renderers = {'plane': render_plane,
+             'polygon': render_polygon,
+             'sphere': render_sphere,
+             'cube': render_cube}
+
+
+def render_job(job):
+    """
+    Renders a job of a manifest, a dictionary containing the type of the
+    texture and the arguments of its render function.
+    """
+    job = dict(job)
+    return renderers[job.pop('type')](**job)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('manifest', help='JSON file containing the jobs')
+    args = parser.parse_args(argv)
+
+    with open(args.manifest) as f:
+        jobs = json.load(f)
+    failed = 0
+    for job in jobs:
+        start = time.perf_counter()
+        try:
+            render_job(job)
+        except Exception:
+            logging.exception('Job {0} failed'.format(job))
+            failed += 1
+            continue
+        print('{0}: {1:.2f}s'.format(job.get('filename'),
+                                     time.perf_counter() - start))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
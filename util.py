@@ -22,8 +22,16 @@
 #******************************************************************************
 import numpy as np
 import random
+import math
+import itertools
+import operator
+import bisect
 from abc import ABCMeta, abstractmethod
+from collections import defaultdict, deque
 import logging
+import time
+import json
+import os
 
 
 def great_circle_distance(standpoint, forepoint):
@@ -75,6 +83,453 @@ def cylindric_to_spheric(height, angle):
     return latitude, longitude
 
 
+def spheric_to_cartesian(latitude, longitude):
+    """
+    Convert spherical coordinates to cartesian coordinates of the
+    corresponding point on the unit sphere.
+
+    Parameters
+    ----------
+    latitude : Latitude between -pi/2 and pi/2.
+    longitude : Longitude between -pi and pi.
+
+    Returns
+    -------
+    Coordinates tuple (x, y, z).
+    """
+    cos_latitude = np.cos(latitude)
+    return (cos_latitude * np.cos(longitude),
+            cos_latitude * np.sin(longitude),
+            np.sin(latitude))
+
+
+class spatial_grid():
+    """
+    Uniform hash grid that stores items by the cell their position falls in.
+    Used to restrict distance checks to items that are close to a given
+    position. Works for positions of any dimension.
+
+    Parameters
+    ----------
+    cell_size : Edge length of a grid cell. Should be at least the largest
+                distance that will be queried for.
+    period : Length after which positions repeat along every axis or None.
+             Cells then wrap around, their size is enlarged to divide the
+             period.
+    """
+
+    def __init__(self, cell_size, period=None):
+        self.period = period
+        if period is not None:
+            self.count = max(int(period // cell_size), 1)
+            cell_size = period / self.count
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self._offsets = {}
+
+    def cell(self, position):
+        cell = tuple(int(math.floor(c / self.cell_size)) for c in position)
+        if self.period is not None:
+            cell = tuple(c % self.count for c in cell)
+        return cell
+
+    def add(self, position, item):
+        self.cells[self.cell(position)].append(item)
+
+    def near(self, position):
+        """
+        Yields all items stored in the cell of the given position or in any
+        of the directly adjacent cells.
+        """
+        center = self.cell(position)
+        offsets = self._offsets.get(len(center))
+        if offsets is None:
+            offsets = list(itertools.product((-1, 0, 1), repeat=len(center)))
+            self._offsets[len(center)] = offsets
+        cells = self.cells
+        keys = (tuple(map(operator.add, center, offset)) for offset in offsets)
+        if self.period is not None:
+            # With less than three cells per axis neighbours repeat.
+            keys = dict.fromkeys(tuple(c % self.count for c in key)
+                                 for key in keys)
+        for key in keys:
+            if key in cells:
+                for item in cells[key]:
+                    yield item
+
+
+class cell_index():
+    """
+    Vectorized counterpart of `spatial_grid` for batches of points.
+    Points are kept sorted by the key of their grid cell, so the neighbouring
+    cells of many query positions can be looked up at once with
+    `np.searchsorted`.
+
+    Parameters
+    ----------
+    cell_size : Edge length of a grid cell. Should be at least the largest
+                distance that will be queried for.
+    dim : Dimension of the positions.
+    period : Length after which positions repeat along every axis or None.
+             See `spatial_grid`.
+    """
+
+    # Bits per axis of the linearized cell key.
+    key_bits = 21
+
+    def __init__(self, cell_size, dim, period=None):
+        self.period = period
+        if period is not None:
+            self.count = max(int(period // cell_size), 1)
+            cell_size = period / self.count
+        self.cell_size = cell_size
+        self.offsets = np.array(list(itertools.product((-1, 0, 1), repeat=dim)))
+        self.keys = np.empty(0, dtype=np.int64)
+        self.order = np.empty(0, dtype=np.intp)
+        self.values = None
+        self.size = 0
+
+    def _keys(self, cells):
+        cells = cells + (1 << (self.key_bits - 1))
+        keys = np.zeros(cells.shape[:-1], dtype=np.int64)
+        for axis in range(cells.shape[-1]):
+            keys = (keys << self.key_bits) | cells[..., axis]
+        return keys
+
+    def _cells(self, positions):
+        cells = np.floor(positions / self.cell_size).astype(np.int64)
+        if self.period is not None:
+            cells %= self.count
+        return cells
+
+    def add(self, positions, values):
+        """
+        Adds points at the given positions. The rows of values are stored
+        alongside and can be looked up with the indices returned by `near`.
+        """
+        count = len(positions)
+        if self.values is None:
+            self.values = np.empty((max(count, 1024), values.shape[1]))
+        if self.size + count > len(self.values):
+            capacity = max(2 * len(self.values), self.size + count)
+            grown = np.empty((capacity, self.values.shape[1]))
+            grown[:self.size] = self.values[:self.size]
+            self.values = grown
+        self.values[self.size:self.size + count] = values
+        new_keys = self._keys(self._cells(positions))
+        new_order = np.argsort(new_keys, kind='stable')
+        new_keys = new_keys[new_order]
+        insert_at = np.searchsorted(self.keys, new_keys)
+        self.keys = np.insert(self.keys, insert_at, new_keys)
+        self.order = np.insert(self.order, insert_at, new_order + self.size)
+        self.size += count
+
+    def near(self, positions):
+        """
+        Returns index arrays (query, point) of all pairs of query positions and
+        stored points that lie in the same or in directly adjacent cells.
+        Periodic indices with less than three cells per axis may return a
+        pair repeatedly.
+        """
+        cells = self._cells(positions)[:, np.newaxis, :] + self.offsets
+        if self.period is not None:
+            cells %= self.count
+        keys = self._keys(cells).ravel()
+        starts = np.searchsorted(self.keys, keys, side='left')
+        counts = np.searchsorted(self.keys, keys, side='right') - starts
+        total = counts.sum()
+        query = np.repeat(np.arange(len(positions)), len(self.offsets))
+        query = np.repeat(query, counts)
+        skip = np.repeat(np.cumsum(counts) - counts - starts, counts)
+        points = self.order[np.arange(total) - skip]
+        return query, points
+
+
+def triangulate_polygon(polygon):
+    """
+    Splits a simple polygon into triangles by ear clipping.
+
+    Parameters
+    ----------
+    polygon : List of (x, y) points describing the polygon.
+
+    Returns
+    -------
+    Array of shape (n, 3, 2) containing the corners of the triangles.
+    """
+    points = [tuple(float(c) for c in point) for point in polygon]
+    signed_area = sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2)
+                      in zip(points, points[1:] + points[:1]))
+    if signed_area < 0:
+        points.reverse()
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    triangles = []
+    remaining = list(points)
+    while len(remaining) > 3:
+        for i in range(len(remaining)):
+            a, b, c = remaining[i - 1], remaining[i], remaining[(i + 1) % len(remaining)]
+            if cross(a, b, c) <= 0:
+                continue
+            if any(cross(a, b, p) >= 0 and cross(b, c, p) >= 0 and
+                   cross(c, a, p) >= 0
+                   for p in remaining if p not in (a, b, c)):
+                continue
+            triangles.append((a, b, c))
+            del remaining[i]
+            break
+        else:
+            raise ValueError('Polygon is not simple')
+    triangles.append(tuple(remaining))
+    return np.array(triangles)
+
+
+class polygon_sampler():
+    """
+    Draws uniformly distributed points from a polygon.
+    The polygon is triangulated once, points are sampled by choosing a
+    triangle weighted by its area and a uniform point inside of it.
+    Samples can be taken from a copy of the polygon scaled around the
+    texture center, which is how the polygon is inset for dots of
+    different radii.
+
+    Parameters
+    ----------
+    polygon : List of (x, y) points describing the polygon.
+    center : Center of the scaling.
+    """
+
+    def __init__(self, polygon, center=(0.5, 0.5)):
+        self.polygon = [(float(x), float(y)) for x, y in polygon]
+        self.center = np.array(center, dtype=np.float64)
+        self.triangles = triangulate_polygon(polygon)
+        corner, first, second = np.transpose(self.triangles, (1, 0, 2))
+        self.origins = corner
+        self.edges = np.stack([first - corner, second - corner], axis=1)
+        areas = np.abs(self.edges[:, 0, 0] * self.edges[:, 1, 1] -
+                       self.edges[:, 0, 1] * self.edges[:, 1, 0])
+        self.cumulative_areas = np.cumsum(areas) / areas.sum()
+        # Plain python copies for sampling single points
+        self._cumulative = self.cumulative_areas.tolist()
+        self._triangles = [(tuple(o), tuple(e[0]), tuple(e[1]))
+                           for o, e in zip(self.origins.tolist(),
+                                           self.edges.tolist())]
+
+    def sample(self, uniform, scale=1):
+        """
+        Maps uniform random numbers of shape (count, 3) to uniformly
+        distributed points in the polygon scaled by scale.
+        Returns an array of shape (count, 2).
+        """
+        uniform = np.asarray(uniform)
+        triangle = np.searchsorted(self.cumulative_areas, uniform[:, 0],
+                                   side='right')
+        triangle = np.minimum(triangle, len(self.triangles) - 1)
+        u, v = uniform[:, 1], uniform[:, 2]
+        outside = u + v > 1
+        u = np.where(outside, 1 - u, u)
+        v = np.where(outside, 1 - v, v)
+        edges = self.edges[triangle]
+        points = (self.origins[triangle] + u[:, np.newaxis] * edges[:, 0] +
+                  v[:, np.newaxis] * edges[:, 1])
+        return self.center + scale * (points - self.center)
+
+    def sample_point(self, u0, u1, u2, scale=1):
+        """
+        Maps three uniform random numbers to a point in the polygon scaled by
+        scale. Scalar version of `sample`.
+        """
+        triangle = min(bisect.bisect_right(self._cumulative, u0),
+                       len(self._triangles) - 1)
+        (ox, oy), (ax, ay), (bx, by) = self._triangles[triangle]
+        if u1 + u2 > 1:
+            u1, u2 = 1 - u1, 1 - u2
+        cx, cy = self.center.tolist()
+        x = ox + u1 * ax + u2 * bx
+        y = oy + u1 * ay + u2 * by
+        return cx + scale * (x - cx), cy + scale * (y - cy)
+
+    def contains(self, x, y, scale=1):
+        """
+        Returns True if the point lies inside the polygon scaled by scale.
+        """
+        cx, cy = self.center.tolist()
+        x = cx + (x - cx) / scale
+        y = cy + (y - cy) / scale
+        inside = False
+        x1, y1 = self.polygon[-1]
+        for x2, y2 in self.polygon:
+            if (y1 > y) != (y2 > y) and \
+                    x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+            x1, y1 = x2, y2
+        return inside
+
+
+class placement_stats():
+    """
+    Collects statistics of a dot placement run.
+    Attach an instance to an iterator with its stats parameter. Iterators
+    without stats do not collect anything.
+
+    The callback is called with the stats and the iterator at most once per
+    interval seconds while dots are accepted and once when the iteration
+    stops.
+
+    Attributes
+    ----------
+    accepted : Number of accepted dots.
+    candidates : Number of generated candidates.
+    distance_checks : Number of distance checks between dots.
+    miss_histogram : Counts of accepted dots by the number of consecutive
+                     misses before them, binned by powers of two. The key is
+                     the lower bound of the bin.
+    generation_time : Seconds spent generating candidates.
+    validation_time : Seconds spent checking candidates.
+    """
+
+    def __init__(self, callback=None, interval=1.):
+        self.callback = callback
+        self.interval = interval
+        self.accepted = 0
+        self.candidates = 0
+        self.distance_checks = 0
+        self.miss_histogram = defaultdict(int)
+        self.generation_time = 0.
+        self.validation_time = 0.
+        self._last_report = time.perf_counter()
+
+    @property
+    def misses(self):
+        return self.candidates - self.accepted
+
+    def record_candidates(self, generation_time, validation_time, candidates,
+                          distance_checks):
+        self.generation_time += generation_time
+        self.validation_time += validation_time
+        self.candidates += candidates
+        self.distance_checks += distance_checks
+
+    def record_accept(self, misses):
+        """
+        Records an accepted dot after the given number of consecutive misses.
+        """
+        self.accepted += 1
+        self.miss_histogram[1 << (misses.bit_length() - 1) if misses else 0] += 1
+
+    def report(self, iterator, force=False):
+        now = time.perf_counter()
+        if self.callback is not None and \
+                (force or now - self._last_report >= self.interval):
+            self._last_report = now
+            self.callback(self, iterator)
+
+
+def print_placement_stats(stats, iterator):
+    """
+    Callback of `placement_stats` printing the state of the placement.
+    """
+    print('Dots:', len(iterator.dots), ' Misses:', iterator.misses,
+          ' Total misses:', stats.misses,
+          ' Distance checks:', stats.distance_checks,
+          ' Generation: {0:.2f}s'.format(stats.generation_time),
+          ' Validation: {0:.2f}s'.format(stats.validation_time))
+
+
+class dot_store():
+    """
+    Growable array of dots with one dot per row.
+    Dots are kept in a single float64 buffer instead of a list of tuples,
+    which needs a fraction of the memory and lets whole layouts be processed
+    with numpy. Iterating and indexing return dots as tuples.
+    During scalar placement the spatial grid of an iterator still keeps a
+    tuple per dot, which is faster to check than a row of the buffer. Batch
+    placement keeps no such copy.
+
+    Parameters
+    ----------
+    width : Number of coordinates of a dot.
+    capacity : Initial number of rows of the buffer.
+    """
+
+    def __init__(self, width, capacity=1024):
+        self.buffer = np.empty((capacity, width))
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return map(tuple, self.array.tolist())
+
+    def __getitem__(self, index):
+        return tuple(self.array[index].tolist())
+
+    def append(self, dot):
+        if self.size == len(self.buffer):
+            self._grow(self.size + 1)
+        self.buffer[self.size] = dot
+        self.size += 1
+
+    def extend(self, dots):
+        """
+        Appends dots given as array with one dot per row.
+        """
+        count = len(dots)
+        if self.size + count > len(self.buffer):
+            self._grow(self.size + count)
+        self.buffer[self.size:self.size + count] = dots
+        self.size += count
+
+    def _grow(self, size):
+        grown = np.empty((max(2 * len(self.buffer), size),
+                          self.buffer.shape[1]))
+        grown[:self.size] = self.buffer[:self.size]
+        self.buffer = grown
+
+    @property
+    def array(self):
+        """
+        Array of all dots as rows. A view that is not updated by dots added
+        later.
+        """
+        return self.buffer[:self.size]
+
+    @property
+    def centers(self):
+        return self.array[:, :2]
+
+    @property
+    def radii(self):
+        """
+        Radii of dots of the form (x, y, r).
+        """
+        return self.array[:, 2]
+
+
+def layout_array(iterator):
+    """
+    Runs the dot iterator to completion and returns the array of all dots
+    it created.
+    """
+    deque(iterator, maxlen=0)
+    return iterator.dots.array
+
+
+def as_dot_array(dots, width):
+    """
+    Returns dots given as `dot_store`, array or iterable of tuples as array
+    with one dot per row. Arrays are not copied.
+    """
+    if isinstance(dots, dot_store):
+        return dots.array
+    if not isinstance(dots, np.ndarray):
+        dots = list(dots)
+    return np.asarray(dots, dtype=np.float64).reshape(-1, width)
+
+
 class _iter_random_dots_base():
     """
     Yields up to n coordinates of points with the minimal
@@ -83,12 +538,36 @@ class _iter_random_dots_base():
     for attempts to generate a valid point is given. If this limit is reached
     the iterator will stop prematurely.
 
+    Distance checks compare distance keys of the dots, by default the dots
+    themselves. Subclasses may override `distance_key` and `keys_collide`
+    to check a representation that is cheaper to compare and `nearby_keys`
+    and `add_dot` to restrict the distance checks of a candidate to a subset
+    of the existing dots.
+
+    If a batch_size is given candidates are drawn and checked in vectorized
+    batches. Conflicts between candidates of the same batch are resolved in
+    the order they were drawn, so the yielded dots are the same a sequential
+    run would have accepted for this sequence of candidates.
+
     Parameters
     ----------
     n : Maximum number of dots to create
     allowed_misses : upper limit for attempts to generate a valid point.
-    verbose: If True will print current state of the algorithm.
-             Amount of created dots, amount of current misses.
+    verbose: If True will print current state of the algorithm once per
+             second. Amount of created dots, amount of current misses.
+    batch_size : Number of candidates per batch. None for sequential
+                 generation.
+    seed : Seed of all random numbers drawn by the iterator. None for a
+           random seed.
+    stats : `placement_stats` collecting statistics of the run. None
+            disables the collection.
+    checkpoint : Filename of a checkpoint of the run. If the file exists the
+                 iteration resumes from it and first yields the dots it
+                 contains. The checkpoint is written every
+                 checkpoint_interval seconds and when the iteration stops.
+                 A checkpoint may be resumed with a larger n, more radii or
+                 a larger allowed_misses to extend the layout.
+    checkpoint_interval : Seconds between two checkpoints.
 
     Returns
     -------
@@ -97,12 +576,29 @@ class _iter_random_dots_base():
 
     __metaclass__ = ABCMeta
 
-    def __init__(self, n, allowed_misses=10000, verbose=False):
+    # Number of coordinates of a dot.
+    dot_width = None
+
+    def __init__(self, n, allowed_misses=10000, verbose=False, batch_size=None,
+                 seed=None, stats=None, checkpoint=None, checkpoint_interval=60):
         self.n = n
         self.allowed_misses = allowed_misses
         self.verbose = verbose
-        self.dots = []
+        if verbose and stats is None:
+            stats = placement_stats(print_placement_stats)
+        self.stats = stats
+        self.batch_size = batch_size
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.rng = np.random.default_rng(seed)
+        self.dots = dot_store(self.dot_width)
         self.misses = 0
+        self.pending = deque()
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_loaded = False
+        self.checkpoint_saved = None
+        self.checkpoint_time = time.perf_counter()
 
     @abstractmethod
     def point_distance_valid(self, p1, p2):
@@ -112,27 +608,300 @@ class _iter_random_dots_base():
     def create_random_point(self):
         return None
 
+    def distance_key(self, dot):
+        """
+        Returns the representation of the dot used for distance checks.
+        """
+        return dot
+
+    def keys_collide(self, k1, k2):
+        """
+        `point_distance_valid` for the distance keys of two dots.
+        """
+        return self.point_distance_valid(k1, k2)
+
+    def nearby_keys(self, key):
+        """
+        Returns the distance keys of all dots that may be too close to the
+        dot with the given key.
+        """
+        return self.dots
+
+    def add_dot(self, dot):
+        self.dots.append(dot)
+
+    def layout_parameters(self):
+        """
+        Returns a dictionary of all parameters that determine the created
+        dots. Together with a seed they identify a layout.
+        """
+        return {'type': type(self).__name__,
+                'n': self.n,
+                'allowed_misses': self.allowed_misses,
+                'batch_size': self.batch_size,
+                'seed': self.seed}
+
+    def create_random_points(self, count):
+        """
+        Returns an array containing count candidates as rows.
+        """
+        return np.array([self.create_random_point() for _ in range(count)])
+
+    def batch_positions(self, candidates):
+        """
+        Returns the positions of the candidates used in `batch_index`.
+        """
+        return candidates
+
+    def batch_keys(self, candidates, positions):
+        """
+        Returns the distance keys of the candidates as rows. These are
+        stored in `batch_index` and compared by `batch_conflicts`.
+        """
+        return candidates
+
+    @abstractmethod
+    def batch_conflicts(self, candidates, dots):
+        """
+        Vectorized `keys_collide` for arrays of distance keys as rows.
+        Supports broadcasting.
+        """
+        return None
+
+    def batch_limit(self):
+        """
+        Returns the maximal number of dots that may be accepted in one batch.
+        """
+        return self.n - len(self.dots)
+
+    def collides(self, candidate):
+        """
+        Returns True if the candidate is too close to any existing dot.
+        """
+        key = self.distance_key(candidate)
+        return any(self.keys_collide(other, key)
+                   for other in self.nearby_keys(key))
+
+    def attempt_instrumented(self, create, *args):
+        """
+        Creates a candidate with create(*args) and checks it like `collides`
+        while recording the work in the stats.
+        Returns the candidate and whether it collides. None candidates
+        always collide.
+        """
+        start = time.perf_counter()
+        candidate = create(*args)
+        generated = time.perf_counter()
+        checks = 0
+        collision = candidate is None
+        if not collision:
+            key = self.distance_key(candidate)
+            for other in self.nearby_keys(key):
+                checks += 1
+                if self.keys_collide(other, key):
+                    collision = True
+                    break
+        self.stats.record_candidates(generated - start,
+                                     time.perf_counter() - generated, 1,
+                                     checks)
+        return candidate, collision
+
+    # Parameters that may differ between a checkpoint and the resumed run.
+    extendable_parameters = ('n', 'allowed_misses')
+
+    def checkpoint_state(self):
+        """
+        Returns the state of the run besides the dots as JSON serializable
+        dictionary.
+        """
+        return {'parameters': self.layout_parameters(),
+                'misses': self.misses,
+                'random': self.random.getstate(),
+                'rng': self.rng.bit_generator.state}
+
+    def restore_state(self, state):
+        """
+        Restores the state returned by `checkpoint_state`.
+        """
+        version, internal, gauss = state['random']
+        self.random.setstate((version, tuple(internal), gauss))
+        self.rng.bit_generator.state = state['rng']
+        self.misses = state['misses']
+
+    def check_checkpoint(self, parameters, dots):
+        """
+        Raises a ValueError if the checkpoint with the given layout
+        parameters and dots cannot be resumed by this iterator.
+        """
+        current = json.loads(json.dumps(self.layout_parameters(),
+                                        default=float))
+        for name in set(current) | set(parameters):
+            if name in self.extendable_parameters:
+                continue
+            if current.get(name) != parameters.get(name):
+                raise ValueError('The checkpoint was created with a '
+                                 'different {0}.'.format(name))
+        if len(dots) > self.n:
+            raise ValueError('The checkpoint contains more than n dots.')
+
+    def save_checkpoint(self, filename):
+        """
+        Writes the dots and the state of the run to the file.
+        """
+        state = json.dumps(self.checkpoint_state(), default=float)
+        temporary = filename + '.tmp'
+        with open(temporary, 'wb') as f:
+            np.savez(f, dots=self.dots.array, state=np.array(state))
+        os.replace(temporary, filename)
+        self.checkpoint_saved = (len(self.dots), self.misses)
+        self.checkpoint_time = time.perf_counter()
+
+    def load_checkpoint(self, filename):
+        """
+        Restores the dots and the state of the run from the file. The
+        restored dots are yielded before any new dot.
+        """
+        if self.dots:
+            raise ValueError('Checkpoints can only be loaded before the '
+                             'first dot is placed.')
+        with np.load(filename) as checkpoint:
+            dots = [tuple(float(c) for c in dot) for dot in checkpoint['dots']]
+            state = json.loads(str(checkpoint['state']))
+        self.check_checkpoint(state['parameters'], dots)
+        for dot in dots:
+            self.add_dot(dot)
+        if self.batch_size and dots:
+            candidates = np.array(dots)
+            positions = self.batch_positions(candidates)
+            self.batch_index.add(positions,
+                                 self.batch_keys(candidates, positions))
+        self.pending.extend(dots)
+        self.restore_state(state)
+        self.checkpoint_saved = (len(self.dots), self.misses)
+
+    def update_checkpoint(self):
+        """
+        Resumes from the checkpoint file on the first call and writes the
+        checkpoint once checkpoint_interval seconds have passed.
+        """
+        if self.checkpoint is None:
+            return
+        if not self.checkpoint_loaded:
+            self.checkpoint_loaded = True
+            if os.path.exists(self.checkpoint):
+                self.load_checkpoint(self.checkpoint)
+            self.checkpoint_time = time.perf_counter()
+        elif (time.perf_counter() - self.checkpoint_time >=
+              self.checkpoint_interval):
+            self.save_checkpoint(self.checkpoint)
+
+    def stop(self):
+        if (self.checkpoint is not None and
+                self.checkpoint_saved != (len(self.dots), self.misses)):
+            self.save_checkpoint(self.checkpoint)
+        if self.stats is not None:
+            self.stats.report(self, force=True)
+        raise StopIteration
+
+    def abort(self):
+        warning = 'Dot iteration was aborted. ' \
+                  'Only {n} points have been created'
+        logging.warning(warning.format(n=len(self.dots)))
+        self.stop()
+
     def __iter__(self):
         return self
 
+    def place_batch(self):
+        """
+        Draws one batch of candidates and accepts all valid candidates.
+        """
+        stats = self.stats
+        start = time.perf_counter()
+        limit = self.batch_limit()
+        # Candidates beyond the limit would be thrown away, which makes
+        # batches of dots with distinct radii slow. After misses the count
+        # grows geometrically with them instead.
+        count = min(self.batch_size, max(limit, self.misses + 1))
+        candidates = self.create_random_points(count)
+        generated = time.perf_counter()
+        positions = self.batch_positions(candidates)
+        keys = self.batch_keys(candidates, positions)
+        rejected = np.zeros(count, dtype=bool)
+        checks = 0
+        if self.batch_index.size:
+            query, near = self.batch_index.near(positions)
+            checks += len(query)
+            conflicts = self.batch_conflicts(keys[query],
+                                             self.batch_index.values[near])
+            rejected[query[conflicts]] = True
+        survivors = np.flatnonzero(~rejected)
+        conflicts = self.batch_conflicts(keys[survivors, np.newaxis],
+                                         keys[np.newaxis, survivors])
+        np.fill_diagonal(conflicts, False)
+        checks += len(survivors) * (len(survivors) - 1) // 2
+        free = np.ones(len(survivors), dtype=bool)
+        accepted = []
+        previous = -1
+        for j, i in enumerate(survivors.tolist()):
+            if not free[j]:
+                continue
+            if self.misses + i - previous - 1 >= self.allowed_misses:
+                self.misses = self.allowed_misses
+                break
+            free &= ~conflicts[j]
+            accepted.append(i)
+            if stats is not None:
+                stats.record_accept(self.misses + i - previous - 1)
+            self.misses = 0
+            previous = i
+            if len(accepted) >= limit:
+                break
+        else:
+            self.misses += count - previous - 1
+        if accepted:
+            self.batch_index.add(positions[accepted], keys[accepted])
+        for row in candidates[accepted]:
+            dot = tuple(float(c) for c in row)
+            self.add_dot(dot)
+            self.pending.append(dot)
+        if stats is not None:
+            stats.record_candidates(generated - start,
+                                    time.perf_counter() - generated, count,
+                                    checks)
+            stats.report(self)
+
     def __next__(self):
+        self.update_checkpoint()
+        if self.batch_size:
+            while not self.pending:
+                if len(self.dots) >= self.n:
+                    self.stop()
+                if self.misses >= self.allowed_misses:
+                    self.abort()
+                self.place_batch()
+            return self.pending.popleft()
+        if self.pending:
+            return self.pending.popleft()
         while len(self.dots) < self.n:
             if self.misses >= self.allowed_misses:
-                warning = 'Dot iteration was aborted. ' \
-                          'Only {n} points have been created'
-                logging.warning(warning.format(n=len(self.dots))
-                )
-                raise StopIteration
-            if self.verbose:
-                print('Dots:', len(self.dots), ' Misses:', self.misses)
-            candidate = self.create_random_point()
-            if any([self.point_distance_valid(dot, candidate) for dot in self.dots]):
+                self.abort()
+            if self.stats is None:
+                candidate = self.create_random_point()
+                collision = self.collides(candidate)
+            else:
+                candidate, collision = self.attempt_instrumented(
+                    self.create_random_point)
+            if collision:
                 self.misses += 1
                 continue
-            self.dots.append(candidate)
+            self.add_dot(candidate)
+            if self.stats is not None:
+                self.stats.record_accept(self.misses)
+                self.stats.report(self)
             self.misses = 0
             return candidate
-        raise StopIteration
+        self.stop()
 
 
 class iter_dots_on_sphere(_iter_random_dots_base):
@@ -159,16 +928,74 @@ class iter_dots_on_sphere(_iter_random_dots_base):
     longitude : Longitude between -pi/2 and pi/2
     """
 
+    dot_width = 2
+
     def __init__(self, min_distance, *args, **kwargs):
         _iter_random_dots_base.__init__(self, *args, **kwargs)
         self.min_distance = min_distance
+        # Points closer than min_distance on the sphere are closer than the
+        # corresponding chord length in space.
+        chord = 2 * math.sin(min(min_distance, np.pi) / 2)
+        self.grid = spatial_grid(chord if chord > 0 else 2)
+        self.batch_index = cell_index(chord if chord > 0 else 2, 3)
+        # Two dots are closer than min_distance if the dot product of their
+        # unit vectors is larger than its cosine. Every pair of dots is
+        # closer than a min_distance beyond pi.
+        if min_distance <= np.pi:
+            self.cos_min_distance = math.cos(min_distance)
+        else:
+            self.cos_min_distance = -2.
+
+    def distance_key(self, dot):
+        # Unit vector of the dot, with trigonometry once per dot instead of
+        # once per distance check.
+        latitude, longitude = dot
+        cos_latitude = math.cos(latitude)
+        return (cos_latitude * math.cos(longitude),
+                cos_latitude * math.sin(longitude),
+                math.sin(latitude))
+
+    def keys_collide(self, k1, k2):
+        return (k1[0] * k2[0] + k1[1] * k2[1] + k1[2] * k2[2] >
+                self.cos_min_distance)
 
     def point_distance_valid(self, p1, p2):
-        return great_circle_distance(p1, p2) < self.min_distance
+        return self.keys_collide(self.distance_key(p1), self.distance_key(p2))
+
+    def layout_parameters(self):
+        parameters = _iter_random_dots_base.layout_parameters(self)
+        parameters['min_distance'] = self.min_distance
+        return parameters
+
+    def batch_keys(self, candidates, positions):
+        return positions
+
+    def batch_conflicts(self, candidates, dots):
+        return np.einsum('...i,...i->...', candidates, dots) > self.cos_min_distance
+
+    def batch_positions(self, candidates):
+        return np.stack(spheric_to_cartesian(candidates[:, 0], candidates[:, 1]),
+                        axis=-1)
+
+    def create_random_points(self, count):
+        points = self.rng.random((count, 2)) * 2 - 1
+        points[:, 0] *= np.pi / 2
+        points[:, 1] *= np.pi
+        return points
+
+    def nearby_keys(self, key):
+        return self.grid.near(key)
+
+    def add_dot(self, dot):
+        _iter_random_dots_base.add_dot(self, dot)
+        # Batches check distances with batch_index only.
+        if not self.batch_size:
+            key = self.distance_key(dot)
+            self.grid.add(key, key)
 
     def create_random_point(self):
-        latitude = (random.random() * 2 - 1) * np.pi / 2
-        longitude = (random.random() * 2 - 1) * np.pi
+        latitude = (self.random.random() * 2 - 1) * np.pi / 2
+        longitude = (self.random.random() * 2 - 1) * np.pi
         return latitude, longitude
 
 
@@ -189,6 +1016,10 @@ class iter_dots_on_plane(_iter_random_dots_base):
     allowed_misses : upper limit for attempts to generate a valid point.
     verbose: If True will print current state of the algorithm.
              Amount of created dots, amount of current misses.
+    periodic : If True the plane wraps around at its edges like a torus and
+               distances are measured to the closest repetition of a dot, so
+               textures of the layout tile seamlessly. Periodic layouts have
+               no border distance.
 
     Returns
     -------
@@ -198,22 +1029,97 @@ class iter_dots_on_plane(_iter_random_dots_base):
     y : y-coordinate in range 0..1
     """
 
-    def __init__(self, radii, border_distance=0, dot_distance_factor=1, *args, **kwargs):
+    dot_width = 3
+
+    def __init__(self, radii, border_distance=0, dot_distance_factor=1, *args,
+                 periodic=False, **kwargs):
         _iter_random_dots_base.__init__(self, n=len(radii), **kwargs)
+        if periodic and border_distance:
+            raise ValueError('Periodic layouts have no border distance')
         self.border_distance = border_distance
         self.dot_distance_factor = dot_distance_factor
+        self.periodic = periodic
         self.radii = sorted(radii, reverse=True)
         #random.shuffle(self.radii)
+        max_distance = 2 * max(self.radii or [0]) * dot_distance_factor
+        period = 1 if periodic else None
+        self.grid = spatial_grid(max_distance if max_distance > 0 else 1,
+                                 period)
+        self.batch_index = cell_index(max_distance if max_distance > 0 else 1,
+                                      2, period)
+        # Index behind the last radius equal to the radius at each index.
+        self.radius_run_end = list(range(1, len(self.radii) + 1))
+        for i in reversed(range(len(self.radii) - 1)):
+            if self.radii[i] == self.radii[i + 1]:
+                self.radius_run_end[i] = self.radius_run_end[i + 1]
 
     def point_distance_valid(self, p1, p2):
         x1, y1, r1 = p1
         x2, y2, r2 = p2
         min_distance = (r1 + r2) * self.dot_distance_factor
-        distance = np.sqrt(((x1 - x2) ** 2) + (y1 - y2) ** 2)
+        dx = abs(x1 - x2)
+        dy = abs(y1 - y2)
+        if self.periodic:
+            dx = min(dx, 1 - dx)
+            dy = min(dy, 1 - dy)
+        distance = np.sqrt(dx ** 2 + dy ** 2)
         return abs(distance) < min_distance
 
+    def layout_parameters(self):
+        parameters = _iter_random_dots_base.layout_parameters(self)
+        parameters.update(radii=self.radii,
+                          border_distance=self.border_distance,
+                          dot_distance_factor=self.dot_distance_factor)
+        # Only periodic layouts record the flag, which keeps the parameters
+        # of cached layouts unchanged.
+        if self.periodic:
+            parameters['periodic'] = True
+        return parameters
+
+    extendable_parameters = ('n', 'allowed_misses', 'radii')
+
+    def check_checkpoint(self, parameters, dots):
+        _iter_random_dots_base.check_checkpoint(self, parameters, dots)
+        # Placed dots took the largest radii, which more radii must not
+        # change.
+        if self.radii[:len(dots)] != [dot[2] for dot in dots]:
+            raise ValueError('The radii of the checkpoint are not the '
+                             'largest radii.')
+
+    def batch_conflicts(self, candidates, dots):
+        min_distance = (candidates[..., 2] + dots[..., 2]) * self.dot_distance_factor
+        dx = np.abs(candidates[..., 0] - dots[..., 0])
+        dy = np.abs(candidates[..., 1] - dots[..., 1])
+        if self.periodic:
+            dx = np.minimum(dx, 1 - dx)
+            dy = np.minimum(dy, 1 - dy)
+        return np.hypot(dx, dy) < min_distance
+
+    def batch_positions(self, candidates):
+        return candidates[:, :2]
+
+    def batch_limit(self):
+        # Candidates of a batch share the radius of the next dot.
+        return self.radius_run_end[len(self.dots)] - len(self.dots)
+
+    def create_random_points(self, count):
+        points = np.empty((count, 3))
+        points[:, :2] = self.rng.random((count, 2)) * (1 - 2 * self.border_distance)
+        points[:, :2] += self.border_distance
+        points[:, 2] = self.radii[len(self.dots)]
+        return points
+
+    def nearby_keys(self, key):
+        return self.grid.near(key[:2])
+
+    def add_dot(self, dot):
+        _iter_random_dots_base.add_dot(self, dot)
+        # Batches check distances with batch_index only.
+        if not self.batch_size:
+            self.grid.add(dot[:2], dot)
+
     def _rand_in_center(self):
-        return random.random() * (1 - 2 * self.border_distance) + self.border_distance
+        return self.random.random() * (1 - 2 * self.border_distance) + self.border_distance
 
     def create_random_point(self):
         x = self._rand_in_center()
@@ -249,16 +1155,210 @@ class iter_dots_in_polygon(iter_dots_on_plane):
     """
 
     def __init__(self, polygon, *args, **kwargs):
+        if kwargs.get('periodic'):
+            raise ValueError('Layouts in polygons cannot be periodic')
         iter_dots_on_plane.__init__(self, *args, **kwargs)
         self.polygon = polygon
+        self.sampler = polygon_sampler(polygon)
+
+    def layout_parameters(self):
+        parameters = iter_dots_on_plane.layout_parameters(self)
+        parameters['polygon'] = [tuple(point) for point in self.polygon]
+        return parameters
+
+    @staticmethod
+    def inset_scale(r):
+        """
+        Returns the factor the polygon is scaled with around the texture
+        center so that dots of radius r placed inside it stay within the
+        original polygon.
+        """
+        return (0.5 - r) / 0.5
 
     def create_random_point(self):
         r = self.radii[len(self.dots)]
+        x, y = self.sampler.sample_point(self.random.random(),
+                                         self.random.random(),
+                                         self.random.random(),
+                                         self.inset_scale(r))
+
+        return x, y, r
+
+    def create_random_points(self, count):
+        r = self.radii[len(self.dots)]
+        points = np.empty((count, 3))
+        points[:, :2] = self.sampler.sample(self.rng.random((count, 3)),
+                                            self.inset_scale(r))
+        points[:, 2] = r
+        return points
+
+
+class _iter_poisson_dots_base():
+    """
+    Mixin that replaces the rejection sampling of `_iter_random_dots_base`
+    with Bridson's Poisson-disk sampling.
+    New dots are generated in the annulus around a randomly chosen active
+    dot. A dot stays active until `candidates` consecutive attempts around it
+    failed. Only if no dot is active a new seed is placed by rejection
+    sampling, which stops the iteration once the domain is saturated.
+    See: R. Bridson, Fast Poisson Disk Sampling in Arbitrary Dimensions,
+         SIGGRAPH 2007
+
+    Parameters
+    ----------
+    candidates : Number of attempts around an active dot before it is retired.
+    """
+
+    def _init_poisson(self, candidates):
+        # Batches of seeds would be placed by rejection sampling and never
+        # become active.
+        if self.batch_size:
+            raise ValueError('Poisson-disk sampling does not support '
+                             'batch_size')
+        self.candidates = candidates
+        self.active = []
+
+    def layout_parameters(self):
+        parameters = super().layout_parameters()
+        parameters['candidates'] = self.candidates
+        return parameters
+
+    def checkpoint_state(self):
+        state = super().checkpoint_state()
+        state['active'] = self.active
+        return state
+
+    def restore_state(self, state):
+        super().restore_state(state)
+        self.active = [tuple(dot) for dot in state['active']]
+
+    def abort(self):
+        # Seeds are only placed once no dot is active, so running out of
+        # attempts means the domain is saturated, which ends every run.
+        logging.info('Poisson-disk sampling saturated after {n} '
+                     'points'.format(n=len(self.dots)))
+        self.stop()
+
+    @abstractmethod
+    def create_point_near(self, dot):
+        """
+        Returns a random point in the annulus around the given dot or None if
+        the point lies outside of the valid domain.
+        """
+        return None
+
+    def __next__(self):
+        self.update_checkpoint()
+        if self.pending:
+            return self.pending.popleft()
+        while len(self.dots) < self.n:
+            if not self.active:
+                seed = _iter_random_dots_base.__next__(self)
+                self.active.append(seed)
+                return seed
+            index = self.random.randrange(len(self.active))
+            for attempt in range(self.candidates):
+                if self.stats is None:
+                    candidate = self.create_point_near(self.active[index])
+                    collision = candidate is None or self.collides(candidate)
+                else:
+                    candidate, collision = self.attempt_instrumented(
+                        self.create_point_near, self.active[index])
+                if collision:
+                    continue
+                self.add_dot(candidate)
+                self.active.append(candidate)
+                if self.stats is not None:
+                    self.stats.record_accept(attempt)
+                    self.stats.report(self)
+                return candidate
+            self.active[index] = self.active[-1]
+            self.active.pop()
+        self.stop()
+
+
+class iter_poisson_dots_on_sphere(_iter_poisson_dots_base, iter_dots_on_sphere):
+    """
+    Poisson-disk sampling variant of `iter_dots_on_sphere`.
+
+    Parameters
+    ----------
+    candidates : Number of attempts around an active dot before it is retired.
+
+    For all other parameters see `iter_dots_on_sphere`.
+    """
+
+    def __init__(self, *args, candidates=30, **kwargs):
+        iter_dots_on_sphere.__init__(self, *args, **kwargs)
+        self._init_poisson(candidates)
+
+    def create_point_near(self, dot):
+        latitude, longitude = dot
+        distance = self.min_distance * (1 + self.random.random())
+        bearing = self.random.random() * 2 * np.pi
+        sin_latitude = (math.sin(latitude) * math.cos(distance) +
+                        math.cos(latitude) * math.sin(distance) *
+                        math.cos(bearing))
+        new_latitude = math.asin(max(-1., min(1., sin_latitude)))
+        d_longitude = math.atan2(
+            math.sin(bearing) * math.sin(distance) * math.cos(latitude),
+            math.cos(distance) - math.sin(latitude) * sin_latitude)
+        new_longitude = (longitude + d_longitude + np.pi) % (2 * np.pi) - np.pi
+        return new_latitude, new_longitude
+
+
+class iter_poisson_dots_on_plane(_iter_poisson_dots_base, iter_dots_on_plane):
+    """
+    Poisson-disk sampling variant of `iter_dots_on_plane`.
+    Supports variable radii, the annulus around an active dot is sized by
+    the radius of the active dot and the radius of the next dot.
+
+    Parameters
+    ----------
+    candidates : Number of attempts around an active dot before it is retired.
+
+    For all other parameters see `iter_dots_on_plane`.
+    """
+
+    def __init__(self, *args, candidates=30, **kwargs):
+        iter_dots_on_plane.__init__(self, *args, **kwargs)
+        self._init_poisson(candidates)
+
+    def point_in_domain(self, x, y, r):
+        low = self.border_distance
+        high = 1 - self.border_distance
+        return low <= x <= high and low <= y <= high
+
+    def create_point_near(self, dot):
+        x, y, r_dot = dot
+        r = self.radii[len(self.dots)]
+        distance = (r_dot + r) * self.dot_distance_factor * (1 + self.random.random())
+        angle = self.random.random() * 2 * np.pi
+        x += distance * math.cos(angle)
+        y += distance * math.sin(angle)
+        if self.periodic:
+            x %= 1
+            y %= 1
+        if not self.point_in_domain(x, y, r):
+            return None
+        return x, y, r
+
+
+class iter_poisson_dots_in_polygon(iter_poisson_dots_on_plane,
+                                   iter_dots_in_polygon):
+    """
+    Poisson-disk sampling variant of `iter_dots_in_polygon`.
+
+    Parameters
+    ----------
+    candidates : Number of attempts around an active dot before it is retired.
+
+    For all other parameters see `iter_dots_in_polygon`.
+    """
 
-        import Polygon
-        polygon = Polygon.Polygon(self.polygon)
-        scale = (0.5 - r) / 0.5
-        polygon.scale(scale, scale, 0.5, 0.5)
-        x, y = polygon.sample(random.random)
+    def __init__(self, *args, candidates=30, **kwargs):
+        iter_dots_in_polygon.__init__(self, *args, **kwargs)
+        self._init_poisson(candidates)
 
-        return x, y, r
\ No newline at end of file
+    def point_in_domain(self, x, y, r):
+        return self.sampler.contains(x, y, self.inset_scale(r))
\ No newline at end of file